@@ -12,6 +12,7 @@ from msepy.manifold.main import MsePyManifold
 from msepy.mesh.main import MsePyMesh
 from msepy.space.main import MsePySpace
 from msepy.form.main import MsePyRootForm
+from msepy.tools.cache import set_cache_limit, cache_stats
 from src.config import SIZE   # MPI.SIZE
 
 
@@ -23,6 +24,8 @@ __all__ = [
     '_parse',
 
     'config',
+    'set_cache_limit',
+    'cache_stats',
 ]
 
 
@@ -68,7 +71,14 @@ def _parse_spaces(abstract_spaces):
             ab_sp = ab_sps[ab_sp_sym_repr]
 
             if ab_sp.orientation != 'unknown':  # Those spaces are probably not for root-forms, skipping is OK.
-                space = MsePySpace(ab_sp)
+                mesh = None
+                for msh_sr in base['meshes']:
+                    if base['meshes'][msh_sr].abstract is ab_sp.mesh:
+                        mesh = base['meshes'][msh_sr]
+                        break
+                    else:
+                        pass
+                space = MsePySpace(ab_sp, mesh=mesh)
                 space_dict[ab_sp_sym_repr] = space
             else:
                 pass
@@ -121,6 +131,13 @@ class _Config(Frozen):
                     break
             assert mnf is not None, f"cannot find a valid mse-py-manifold."
 
-            return _mh_config(self._obj, mnf, *args, **kwargs)
+            _mh_config(self._obj, mnf, *args, **kwargs)
+            abstract_boundary = abstract_mesh._boundary
+            for msh_sr in base['meshes']:
+                msh = base['meshes'][msh_sr]
+                if abstract_boundary is not None and msh.abstract is abstract_boundary:
+                    msh._base = mesh  # the mesh on the boundary refers to the boundary faces of `mesh`.
+                else:
+                    pass
         else:
             raise NotImplementedError()
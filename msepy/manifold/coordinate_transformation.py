@@ -39,6 +39,49 @@ class MsePyManifoldsCoordinateTransformation(Frozen):
 
         return _2return
 
+    def _group_regions_by_mapping_class(self, regions):
+        """Split `regions` into groups. Regions in a group (of more than one region) have mappings of the
+        same class that can be batched; see `_batchable_mapping` of region ct.
+        """
+        groups = dict()
+        for ri in regions:
+            assert ri in self._mf.regions, f"region index = {ri} is not a valid one!"
+            instance = self._mf.regions[ri]._ct._batchable_mapping
+            if instance is None:
+                groups[('region', ri)] = [ri, ]
+            else:
+                key = instance.__class__
+                if key in groups:
+                    groups[key].append(ri)
+                else:
+                    groups[key] = [ri, ]
+        return list(groups.values())
+
+    def _batched_mapping(self, regions, counts, *rst):
+        """Evaluate the mappings of `regions` (of the same batchable mapping class) in one call.
+
+        The last axis of each `rst` array is split into `len(regions)` parts, `counts[k]` columns for
+        region #`regions[k]`. The returned arrays are split in the same way.
+        """
+        instances = [self._mf.regions[ri]._ct._batchable_mapping for ri in regions]
+        mapping_class = instances[0].__class__
+        assert all([_.__class__ is mapping_class for _ in instances]), f"regions must have the same mapping class."
+        return mapping_class._batched_mapping(instances, counts, *rst)
+
+    def _batched_affine(self, regions, counts):
+        """If the mappings of `regions` (of the same class) are affine, return the `scale` and `shift` such that
+        `x_i = r_i * scale[i] + shift[i]` for the stacked `counts` columns of `regions`; otherwise, return None.
+        See `_affine_mapping` of region ct.
+        """
+        instances = [self._mf.regions[ri]._ct._affine_mapping for ri in regions]
+        if any([_ is None for _ in instances]):
+            return None
+        else:
+            mapping_class = instances[0].__class__
+            assert all([_.__class__ is mapping_class for _ in instances]), \
+                f"regions must have the same mapping class."
+            return mapping_class._batched_affine(instances, counts)
+
     def Jacobian_matrix(self, *rst, regions=None):
         """"""
         if isinstance(regions, int):
@@ -38,8 +38,11 @@ def config(mf, arg, **kwargs):
             mtype_dict
         )
 
-        map_type = 0
         assert mf.regions.map is not None, f"predefined manifold only config manifold with region map."
+        if mf.regions.is_structured():
+            map_type = 0
+        else:
+            map_type = 1
 
     else:
         raise NotImplementedError()
@@ -4,7 +4,7 @@
 @contact: zhangyi_aero@hotmail.com
 """
 from src.tools.frozen import Frozen
-from numpy import ones_like
+from numpy import broadcast_to, shape, repeat
 
 
 class _LinearTransformation(Frozen):
@@ -46,5 +46,50 @@ class _LinearTransformation(Frozen):
         J = [[0 for _ in range(I)] for _ in range(I)]
         r = rst[0]
         for i in range(I):
-            J[i][i] = self._delta[i] * ones_like(r)   # important, must do ones_like.
+            # important, must be an array of the shape of r; it is a read-only constant view taking O(1) memory.
+            J[i][i] = broadcast_to(float(self._delta[i]), shape(r))
         return tuple(J)
+
+    @staticmethod
+    def _batched_affine(instances, counts):
+        """The mappings of many `_LinearTransformation` instances are affine, `x_i = r_i * scale[i] + shift[i]`.
+
+        Parameters
+        ----------
+        instances :
+            A list of `_LinearTransformation` instances.
+        counts :
+            `counts[k]` entries (columns) for `instances[k]`.
+
+        Returns
+        -------
+        scale : list
+            `scale[i]` is a 1-d array of length `sum(counts)`.
+        shift : list
+            `shift[i]` is a 1-d array of length `sum(counts)`.
+
+        """
+        scale = list()
+        shift = list()
+        for i in range(len(instances[0]._low_bounds)):
+            scale.append(repeat([_._delta[i] for _ in instances], counts))
+            shift.append(repeat([_._low_bounds[i] for _ in instances], counts))
+        return scale, shift
+
+    @staticmethod
+    def _batched_mapping(instances, counts, *rst):
+        """The mapping of many `_LinearTransformation` instances in one vectorized call.
+
+        Parameters
+        ----------
+        instances :
+            A list of `_LinearTransformation` instances.
+        counts :
+            The last axis of each `rst` array is split into `len(instances)` parts, `counts[k]` columns for
+            `instances[k]`.
+        rst :
+            Arrays whose last axis is of length `sum(counts)` (or can be broadcast to it).
+
+        """
+        scale, shift = _LinearTransformation._batched_affine(instances, counts)
+        return [r * scale[i] + shift[i] for i, r in enumerate(rst)]
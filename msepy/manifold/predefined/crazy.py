@@ -5,7 +5,8 @@
 @time: 11/26/2022 2:56 PM
 """
 
-from numpy import sin, pi, cos, ones_like
+import numpy as np
+from numpy import pi, broadcast_to, shape
 
 import warnings
 from src.tools.frozen import Frozen
@@ -77,56 +78,21 @@ class _MesPyRegionCrazyMapping(Frozen):
         self._esd = esd
         self._freeze()
 
+    _chunk_size = 2 ** 13  # amount of points evaluated at once by the fused kernel; fits in cache.
+
     def mapping(self, *rst):
         """ `*rst` be in [0, 1]. """
         assert len(rst) == self._esd, f"amount of inputs wrong."
 
-        if self._esd == 1:
-            r = rst[0]
-            a, b = self._bounds[0]
-            x = (b - a) * (r + 0.5 * self._c * sin(2 * pi * r)) + a
-            return [x]
-
-        elif self._esd == 2:
-
-            r, s = rst
-            a, b = self._bounds[0]
-            c, d = self._bounds[1]
-            if self._c == 0:
-                x = (b - a) * r + a
-                y = (d - c) * s + c
-            else:
-                x = (b - a) * (r + 0.5 * self._c * sin(2 * pi * r) * sin(2 * pi * s)) + a
-                y = (d - c) * (s + 0.5 * self._c * sin(2 * pi * r) * sin(2 * pi * s)) + c
-            return x, y
-
-        elif self._esd == 3:
-            r, s, t = rst
-            a, b = self._bounds[0]
-            c, d = self._bounds[1]
-            e, f = self._bounds[2]
-
-            if self._c == 0:
-                x = (b - a) * r + a
-                y = (d - c) * s + c
-                z = (f - e) * t + e
-
-            else:
-                x = (b - a) * (r + 0.5 * self._c *
-                               sin(2 * pi * r) *
-                               sin(2 * pi * s) *
-                               sin(2 * pi * t)) + a
-                y = (d - c) * (s + 0.5 * self._c *
-                               sin(2 * pi * r) *
-                               sin(2 * pi * s) *
-                               sin(2 * pi * t)) + c
-                z = (f - e) * (t + 0.5 * self._c *
-                               sin(2 * pi * r) *
-                               sin(2 * pi * s) *
-                               sin(2 * pi * t)) + e
-
-            return x, y, z
+        if self._c == 0:
+            xyz = [(ub - lb) * r + lb for r, (lb, ub) in zip(rst, self._bounds)]
+        else:
+            xyz = self._fused(*rst, Jacobian=False)[0]
 
+        if self._esd == 1:
+            return xyz
+        elif self._esd in (2, 3):
+            return tuple(xyz)
         else:
             raise NotImplementedError()
 
@@ -134,75 +100,119 @@ class _MesPyRegionCrazyMapping(Frozen):
         """ r, s, t be in [0, 1]. """
         assert len(rst) == self._esd, f"amount of inputs wrong."
 
-        if self._esd == 1:
-            r = rst[0]
-            a, b = self._bounds[0]
-            if self._c == 0:
-                xr = (b - a) * ones_like(r)
-            else:
-                xr = (b - a) + (b - a) * 2 * pi * 0.5 * self._c * cos(2 * pi * r)
-            return [[xr]]
+        if self._c == 0:
+            points_shape = np.broadcast_shapes(*[shape(_) for _ in rst])
+            J = [[0 for _ in range(self._esd)] for _ in range(self._esd)]
+            for i, (lb, ub) in enumerate(self._bounds):
+                J[i][i] = broadcast_to(float(ub - lb), points_shape)
+        else:
+            J = self._fused(*rst, mapping=False)[1]
 
+        if self._esd == 1:
+            return [[J[0][0]]]
         elif self._esd == 2:
-            r, s = rst
-            
-            a, b = self._bounds[0]
-            c, d = self._bounds[1]
-            if self._c == 0:
-                xr = (b - a) * ones_like(r)
-                xs = 0
-                yr = 0
-                ys = (d - c) * ones_like(r)
-
-            else:
-                xr = (b - a) + (b - a) * 2 * pi * 0.5 * self._c * cos(2 * pi * r) * sin(2 * pi * s)
-                xs = (b - a) * 2 * pi * 0.5 * self._c * sin(2 * pi * r) * cos(2 * pi * s)
-                yr = (d - c) * 2 * pi * 0.5 * self._c * cos(2 * pi * r) * sin(2 * pi * s)
-                ys = (d - c) + (d - c) * 2 * pi * 0.5 * self._c * sin(2 * pi * r) * cos(2 * pi * s)
-            return ((xr, xs),
-                    (yr, ys))
-
+            return tuple([tuple(_) for _ in J])
         elif self._esd == 3:
+            return [tuple(_) for _ in J]
+        else:
+            raise NotImplementedError()
+
+    @staticmethod
+    def _batched_affine(instances, counts):
+        """If `c == 0` for all `instances`, their mappings are affine, `x_i = r_i * scale[i] + shift[i]`, return
+        `scale` and `shift` (1-d arrays of length `sum(counts)`, `counts[k]` entries for `instances[k]`);
+        otherwise, return None.
+        """
+        if all([_._c == 0 for _ in instances]):
+            scale = list()
+            shift = list()
+            for i in range(instances[0]._esd):
+                scale.append(np.repeat([_._bounds[i][1] - _._bounds[i][0] for _ in instances], counts))
+                shift.append(np.repeat([_._bounds[i][0] for _ in instances], counts))
+            return scale, shift
+        else:
+            return None
 
-            r, s, t = rst
-            a, b = self._bounds[0]
-            c, d = self._bounds[1]
-            e, f = self._bounds[2]
-
-            if self._c == 0:
-                xr = (b - a) * ones_like(r)
-                xs = 0  # np.zeros_like(r)
-                xt = 0
-    
-                yr = 0
-                ys = (d - c) * ones_like(r)
-                yt = 0
-    
-                zr = 0
-                zs = 0
-                zt = (f - e) * ones_like(r)
+    def mapping_and_Jacobian(self, *rst):
+        """Compute the mapping and the Jacobian matrix together; each trigonometric factor is computed once."""
+        assert len(rst) == self._esd, f"amount of inputs wrong."
+        if self._c == 0:
+            return self.mapping(*rst), self.Jacobian_matrix(*rst)
+        else:
+            xyz, J = self._fused(*rst)
+            if self._esd == 1:
+                return xyz, [[J[0][0]]]
+            elif self._esd == 2:
+                return tuple(xyz), tuple([tuple(_) for _ in J])
+            elif self._esd == 3:
+                return tuple(xyz), [tuple(_) for _ in J]
             else:
-                xr = (b - a) + (b - a) * 2 * pi * 0.5 * self._c * cos(2 * pi * r) * sin(2 * pi * s) * sin(
-                    2 * pi * t)
-                xs = (b - a) * 2 * pi * 0.5 * self._c * sin(2 * pi * r) * cos(2 * pi * s) * sin(
-                    2 * pi * t)
-                xt = (b - a) * 2 * pi * 0.5 * self._c * sin(2 * pi * r) * sin(2 * pi * s) * cos(
-                    2 * pi * t)
-    
-                yr = (d - c) * 2 * pi * 0.5 * self._c * cos(2 * pi * r) * sin(2 * pi * s) * sin(
-                    2 * pi * t)
-                ys = (d - c) + (d - c) * 2 * pi * 0.5 * self._c * sin(2 * pi * r) * cos(2 * pi * s) * sin(
-                    2 * pi * t)
-                yt = (d - c) * 2 * pi * 0.5 * self._c * sin(2 * pi * r) * sin(2 * pi * s) * cos(
-                    2 * pi * t)
-    
-                zr = (f - e) * 2 * pi * 0.5 * self._c * cos(2 * pi * r) * sin(2 * pi * s) * sin(
-                    2 * pi * t)
-                zs = (f - e) * 2 * pi * 0.5 * self._c * sin(2 * pi * r) * cos(2 * pi * s) * sin(
-                    2 * pi * t)
-                zt = (f - e) + (f - e) * 2 * pi * 0.5 * self._c * sin(2 * pi * r) * sin(2 * pi * s) * cos(
-                    2 * pi * t)
-    
-            return [(xr, xs, xt),
-                    (yr, ys, yt),
-                    (zr, zs, zt)]
+                raise NotImplementedError()
+
+    def _fused(self, *rst, mapping=True, Jacobian=True):
+        """The fused kernel of the mapping and the Jacobian matrix for `c != 0`.
+
+        With `S = prod_k sin(2 pi r_k)` and `L_i = ub_i - lb_i`,
+
+            x_i = L_i * (r_i + 0.5 c S) + lb_i,
+            d(x_i)/d(r_j) = L_i * (delta_ij + c pi cos(2 pi r_j) prod_{k != j} sin(2 pi r_k)),
+
+        so the last factor, `Q_j`, is shared by all `x_i`. Points are processed in chunks of
+        `_chunk_size` and the temporaries of a chunk are reused in place.
+        """
+        esd = self._esd
+        rst = np.broadcast_arrays(*[np.asarray(_) for _ in rst])
+        points_shape = rst[0].shape
+        dtype = np.result_type(*rst, float)
+        rst = [np.ravel(_) for _ in rst]
+        num_points = rst[0].size
+        lengths = [ub - lb for lb, ub in self._bounds]
+        c = self._c
+
+        xyz = [np.empty(num_points, dtype=dtype) for _ in range(esd)] if mapping else None
+        J = [[np.empty(num_points, dtype=dtype) for _ in range(esd)] for _ in range(esd)] if Jacobian else None
+
+        chunk_size = min(self._chunk_size, max(num_points, 1))
+        sin_ = [np.empty(chunk_size, dtype=dtype) for _ in range(esd)]
+        cos_ = [np.empty(chunk_size, dtype=dtype) for _ in range(esd)] if Jacobian else None
+        temp = np.empty(chunk_size, dtype=dtype)
+
+        for start in range(0, num_points, chunk_size):
+            end = min(start + chunk_size, num_points)
+            n = end - start
+            r_chunk = [_[start:end] for _ in rst]
+            s_chunk = [_[:n] for _ in sin_]
+            t = temp[:n]
+            for k in range(esd):
+                np.multiply(r_chunk[k], 2 * pi, out=t)
+                if Jacobian:
+                    np.cos(t, out=cos_[k][:n])
+                np.sin(t, out=s_chunk[k])
+
+            if mapping:
+                np.multiply(s_chunk[0], 0.5 * c, out=t)
+                for k in range(1, esd):
+                    t *= s_chunk[k]   # t = 0.5 c S
+                for i in range(esd):
+                    x = xyz[i][start:end]
+                    np.add(r_chunk[i], t, out=x)
+                    x *= lengths[i]
+                    x += self._bounds[i][0]
+
+            if Jacobian:
+                for j in range(esd):
+                    np.multiply(cos_[j][:n], c * pi, out=t)
+                    for k in range(esd):
+                        if k != j:
+                            t *= s_chunk[k]   # t = Q_j
+                    for i in range(esd):
+                        Jij = J[i][j][start:end]
+                        np.multiply(t, lengths[i], out=Jij)
+                        if i == j:
+                            Jij += lengths[i]
+
+        if mapping:
+            xyz = [_.reshape(points_shape) for _ in xyz]
+        if Jacobian:
+            J = [[_.reshape(points_shape) for _ in J_i] for J_i in J]
+        return xyz, J
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import numpy as np
+from src.tools.frozen import Frozen
+from msepy.manifold.predefined._helpers import _LinearTransformation
+from msepy.manifold.predefined.crazy import _MesPyRegionCrazyMapping
+
+
+def multi_block_box(mf, layout=None, bounds=None, c=0, periodic=False):
+    """A box tiled by `Nx x Ny x ...` regions (blocks).
+
+    ^ y
+    |
+    |   __________________________
+    |   |        |       |       |
+    |   |   r3   |  r4   |  r5   |
+    |   |________|_______|_______|
+    |   |        |       |       |
+    |   |   r0   |  r1   |  r2   |
+    |   |________|_______|_______|        layout = (3, 2)
+    |
+    .-------------------------------> x
+
+    Regions are numbered along x first, then y, then z, i.e., region `(ix, iy, iz)` is region
+    `ix + Nx * (iy + Ny * iz)`.
+
+    Parameters
+    ----------
+    mf
+    layout :
+        The amount of regions along each axis; an int (for all axes) or a list of ints.
+        When it is None, it is 2 along each axis.
+    bounds :
+        The bounds of the box, `[(x0, x1), (y0, y1), ...]`. When it is None, the box is [0, 1]^n.
+    c :
+        The curvature of the crazy-style perturbation of the whole box. When `c == 0`, all regions are
+        `_LinearTransformation` regions of 'Linear' mtype.
+    periodic :
+        If True, the box is periodic along all axes.
+
+    Returns
+    -------
+
+    """
+    assert mf.esd == mf.ndim, f"multi_block_box mesh only works for manifold.ndim == embedding space dimensions."
+    esd = mf.esd
+    if layout is None:
+        layout = [2 for _ in range(esd)]
+    elif isinstance(layout, (int, float)):
+        layout = [layout for _ in range(esd)]
+    else:
+        assert len(layout) == esd, f"layout={layout} dimensions wrong."
+    layout = np.array(layout)
+    assert np.issubdtype(layout.dtype, np.integer) and np.all(layout > 0), \
+        f"layout={layout} is illegal, it must be positive integers."
+    if bounds is None:
+        bounds = [(0, 1) for _ in range(esd)]
+    else:
+        assert len(bounds) == esd, f"bounds={bounds} dimensions wrong."
+
+    num_regions = int(np.prod(layout))
+    strides = np.concatenate([[1], np.cumprod(layout)[:-1]])
+    regions = np.arange(num_regions)
+    indices = (regions[:, None] // strides) % layout   # (num_regions, esd), the (ix, iy, ...) of all regions.
+
+    # the region map --------------------------------------------------------------------------------
+    rmp = np.empty((num_regions, 2 * esd), dtype=int)
+    for i in range(esd):
+        lower = indices[:, i] == 0
+        upper = indices[:, i] == layout[i] - 1
+        rmp[:, 2 * i] = regions - strides[i]
+        rmp[:, 2 * i + 1] = regions + strides[i]
+        if periodic:
+            rmp[lower, 2 * i] += layout[i] * strides[i]
+            rmp[upper, 2 * i + 1] -= layout[i] * strides[i]
+        else:
+            rmp[lower, 2 * i] = -1
+            rmp[upper, 2 * i + 1] = -1
+    rmp = rmp.tolist()
+    region_map = {
+        r: [None if _ < 0 else _ for _ in rmp[r]] for r in range(num_regions)
+    }
+
+    # the block bounds ------------------------------------------------------------------------------
+    nodes = [np.linspace(lb, ub, n + 1) for (lb, ub), n in zip(bounds, layout)]
+    lbs = np.array([nodes[i][indices[:, i]] for i in range(esd)]).T.tolist()
+    ubs = np.array([nodes[i][indices[:, i] + 1] for i in range(esd)]).T.tolist()
+
+    # mappings and mtypes ---------------------------------------------------------------------------
+    if c == 0:
+        rms = [
+            _LinearTransformation(*[b for lu in zip(lbs[r], ubs[r]) for b in lu]) for r in range(num_regions)
+        ]
+        deltas = np.round(np.array(ubs) - np.array(lbs), 5)  # do this to round off the truncation error.
+        parameters = [
+            ['xyz'[i] + str(d) for i, d in enumerate(deltas_r)] for deltas_r in deltas.tolist()
+        ]
+        mtype_dict = {
+            r: {'indicator': 'Linear', 'parameters': parameters[r]} for r in range(num_regions)
+        }
+    else:
+        box = _MesPyRegionCrazyMapping(bounds, c, esd)
+        indices = indices.tolist()
+        rms = [_MsePyRegionPerturbedBlock(box, indices[r], layout) for r in range(num_regions)]
+        mtype_dict = {r: None for r in range(num_regions)}  # unique regions.
+
+    mapping_dict = {r: rms[r].mapping for r in range(num_regions)}
+    Jacobian_matrix_dict = {r: rms[r].Jacobian_matrix for r in range(num_regions)}
+
+    return region_map, mapping_dict, Jacobian_matrix_dict, mtype_dict
+
+
+class _MsePyRegionPerturbedBlock(Frozen):
+    """Block `(ix, iy, ...)` of a box perturbed by a crazy mapping; the mapping is the crazy mapping of
+    the box composed with `r_i -> (index_i + r_i) / layout_i`.
+    """
+
+    def __init__(self, box, index, layout):
+        """"""
+        self._box = box
+        self._index = index
+        self._layout = layout
+        self._freeze()
+
+    def _box_coordinates(self, rst):
+        """The reference coordinates in the box."""
+        return [(i + r) / n for i, r, n in zip(self._index, rst, self._layout)]
+
+    def mapping(self, *rst):
+        """"""
+        return self._box.mapping(*self._box_coordinates(rst))
+
+    def Jacobian_matrix(self, *rst):
+        """"""
+        J = self._box.Jacobian_matrix(*self._box_coordinates(rst))
+        return self._scale_Jacobian(J, self._layout)
+
+    def mapping_and_Jacobian(self, *rst):
+        """"""
+        xyz, J = self._box.mapping_and_Jacobian(*self._box_coordinates(rst))
+        return xyz, self._scale_Jacobian(J, self._layout)
+
+    @staticmethod
+    def _scale_Jacobian(J, layout):
+        """d(x_i)/d(r_j) = d(x_i)/d(box_j) / layout_j."""
+        return tuple([tuple([Jij / layout[j] for j, Jij in enumerate(Ji)]) for Ji in J])
+
+    @staticmethod
+    def _batched_mapping(instances, counts, *rst):
+        """The mapping of many blocks of the same box in one call; see `_LinearTransformation._batched_mapping`."""
+        box = instances[0]._box
+        assert all([_._box is box for _ in instances]), f"blocks must be of the same box."
+        layout = instances[0]._layout
+        index = np.repeat(np.array([_._index for _ in instances]), counts, axis=0)
+        box_rst = [(index[:, i] + r) / layout[i] for i, r in enumerate(rst)]
+        return box.mapping(*box_rst)
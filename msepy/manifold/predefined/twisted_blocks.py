@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import sys
+if './' not in sys.path:
+    sys.path.append('./')
+
+import numpy as np
+from numpy import broadcast_to, shape
+from src.tools.frozen import Frozen
+
+
+def twisted_blocks(mf, n=2):
+    """A row of `n` unit blocks along x, `[k, k+1] x [0, 1]^(esd-1)`, whose region map is unstructured
+    (`map_type = 1`), so the neighbours of regions are found by `regions.interfaces`.
+
+    ^ y
+    |   _______________________________
+    |   |    s    |         |    s    |
+    |   |    ^    |  .-> s  |    ^    |
+    |   |    |    |  |      |    |    |
+    |   |    .->r |  v r    |    .->r |
+    |   |_________|_________|_________|
+    |       r0        r1        r2          (n = 3, the reference axes of the regions)
+    .---------------------------------------> x
+
+    Odd blocks are twisted: in 2-d, `(r, s) -> (k + s, 1 - r)` (rotated); in 3-d,
+    `(r, s, t) -> (k + t, 1 - s, r)` (rotated and flipped). So the layouts of odd blocks are those of even
+    blocks with the axes swapped; for example, `{0: [2, 3], 1: [3, 2]}` for two 2-d blocks.
+
+    Parameters
+    ----------
+    mf
+    n :
+        The amount of blocks.
+
+    Returns
+    -------
+
+    """
+    assert mf.esd == mf.ndim, f"twisted_blocks mesh only works for manifold.ndim == embedding space dimensions."
+    esd = mf.esd
+    assert esd in (2, 3), f"twisted_blocks mesh only works in 2-d and 3-d."
+    assert n % 1 == 0 and n >= 1, f"n={n} is illegal, it must be a positive integer."
+
+    rms = [_MsePyRegionTwistedBlock(k, esd, k % 2 == 1) for k in range(int(n))]
+    region_map = {r: None for r in range(len(rms))}   # neighbours will be found geometrically.
+    mapping_dict = {r: rms[r].mapping for r in range(len(rms))}
+    Jacobian_matrix_dict = {r: rms[r].Jacobian_matrix for r in range(len(rms))}
+    mtype_dict = {r: None for r in range(len(rms))}   # unique regions.
+
+    return region_map, mapping_dict, Jacobian_matrix_dict, mtype_dict
+
+
+class _MsePyRegionTwistedBlock(Frozen):
+    """The block `[k, k+1] x [0, 1]^(esd-1)`, `x_i = sum_j A_ij r_j + b_i`; if `twisted`, `A` is a rotation (and
+    a flip in 3-d) of the axes.
+    """
+
+    def __init__(self, k, esd, twisted):
+        """"""
+        if not twisted:
+            A = np.eye(esd)
+            b = [k, 0, 0][:esd]
+        elif esd == 2:
+            A = np.array([[0, 1], [-1, 0]])
+            b = [k, 1]
+        else:
+            A = np.array([[0, 0, 1], [0, -1, 0], [1, 0, 0]])
+            b = [k, 1, 0]
+        self._A = A
+        self._b = b
+        self._freeze()
+
+    def mapping(self, *rst):
+        """"""
+        assert len(rst) == len(self._b), f"amount of inputs wrong."
+        xyz = list()
+        for i, bi in enumerate(self._b):
+            x = bi
+            for j, r in enumerate(rst):
+                if self._A[i, j] != 0:
+                    x = x + self._A[i, j] * r
+                else:
+                    pass
+            xyz.append(x)
+        return tuple(xyz)
+
+    def Jacobian_matrix(self, *rst):
+        """"""
+        assert len(rst) == len(self._b), f"amount of inputs wrong."
+        points_shape = np.broadcast_shapes(*[shape(_) for _ in rst])
+        J = [[0 for _ in rst] for _ in rst]
+        for i in range(len(rst)):
+            for j in range(len(rst)):
+                if self._A[i, j] != 0:
+                    J[i][j] = broadcast_to(float(self._A[i, j]), points_shape)
+                else:
+                    pass
+        return tuple([tuple(_) for _ in J])
+
+
+if __name__ == '__main__':
+    # python msepy/manifold/predefined/twisted_blocks.py
+    import __init__ as ph
+    from msepy.mesh.elements import MsePyMeshLayoutError
+
+    for space_dim, layout, wrong_layout in (
+        (2, {0: [2, 3], 1: [3, 2], 2: [2, 3]}, {0: [2, 3], 1: [2, 3], 2: [2, 3]}),
+        (3, {0: [2, 3, 4], 1: [4, 3, 2], 2: [2, 3, 4]}, {0: [2, 3, 4], 1: [2, 3, 4], 2: [2, 3, 4]}),
+    ):
+        ph.config.set_embedding_space_dim(space_dim)
+        manifold = ph.manifold(space_dim)
+        mesh = ph.mesh(manifold)
+        wrong_manifold = ph.manifold(space_dim)
+        wrong_mesh = ph.mesh(wrong_manifold)
+        msepy, obj = ph.fem.apply('msepy', locals())
+        msepy.config(obj['manifold'])('twisted_blocks', n=3)
+        msepy.config(obj['wrong_manifold'])('twisted_blocks', n=3)
+        msepy.config(obj['mesh'])(layout)
+
+        element_map = obj['mesh'].elements.map
+        elements, faces = np.nonzero(element_map >= 0)
+        neighbors = element_map[elements, faces]
+        # adjacency is symmetric: every neighbour has the element among its neighbours, across a face.
+        assert all([e in element_map[n] for e, n in zip(elements, neighbors)]), f"element map not symmetric."
+        # glued faces share their centers.
+        centers = np.array(obj['mesh'].ct.mapping(*[np.zeros(1) for _ in range(space_dim)]))[:, 0, :]
+        distance = np.linalg.norm(centers[:, elements] - centers[:, neighbors], axis=0)
+        assert np.all(distance <= 1 / min([min(_) for _ in layout.values()]) + 1e-12), f"neighbours too far."
+        # the boundary faces are those of the box [0, 3] x [0, 1]^(esd-1).
+        box = {2: 2 * (6 + 3), 3: 2 * (6 * 3 + 6 * 4 + 3 * 4)}[space_dim]
+        assert np.sum(element_map == -1) == box, f"boundary faces wrong."
+
+        try:
+            msepy.config(obj['wrong_mesh'])(wrong_layout)
+        except MsePyMeshLayoutError as e:
+            print(space_dim, 'd twisted blocks:', len(element_map), 'elements;', e)
+        else:
+            raise Exception(f"mismatched layouts not found.")
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import sys
+
+if './' not in sys.path:
+    sys.path.append('./')
+from itertools import product
+import numpy as np
+from src.tools.frozen import Frozen
+
+
+class MsePyRegionInterfaces(Frozen):
+    """The region-interface graph: which face of which region is glued to which face of which region, and how
+    their face coordinates are oriented with respect to each other.
+
+    Faces of region #i are numbered like the region map, `[x-, x+, y-, y+, ...]`; face #j is on axis `j // 2`
+    and side `j % 2`. Shared faces are found by hashing the quantized physical coordinates of their corners
+    and centers (computed with the region mappings), so it costs (nearly) linear time in the amount of regions.
+    """
+
+    def __init__(self, regions, tolerance=1e-8):
+        """
+
+        Parameters
+        ----------
+        regions :
+            The regions, `MseManifoldRegions`.
+        tolerance :
+            Points closer than `tolerance` times the size of the manifold are considered identical.
+
+        """
+        self._regions = regions
+        self._tolerance = tolerance
+        self._interfaces = None
+        self._freeze()
+
+    def __getitem__(self, region_face):
+        """For `(i, j)`, return None if face #j of region #i is on the boundary. Otherwise, return
+        `(neighbor_region, neighbor_face, permutation, flips)`: the tangential axis #k of face #j of
+        region #i is the tangential axis #`permutation[k]` of the neighbor face, reversed if `flips[k]`.
+        """
+        if self._interfaces is None:
+            self._interfaces = self._find_interfaces()
+        return self._interfaces.get(region_face, None)
+
+    def __len__(self):
+        """How many (directed) region-face interfaces."""
+        if self._interfaces is None:
+            self._interfaces = self._find_interfaces()
+        return len(self._interfaces)
+
+    @staticmethod
+    def _face_points(ndim):
+        """The reference coordinates of the corners and the center of all `2 * ndim` faces of [0, 1]^ndim.
+
+        Returns
+        -------
+        points :
+            A 2-d array of shape (ndim, num_points).
+        corner_bits :
+            A list of tuples, `corner_bits[m]` is the tangential coordinates (0 or 1) of corner #m.
+
+        Points are ordered face by face; in each face, corners (in the order of `corner_bits`) then the center.
+        """
+        corner_bits = list(product((0, 1), repeat=ndim - 1))
+        points = list()
+        for j in range(2 * ndim):
+            axis, side = j // 2, j % 2
+            for bits in corner_bits + [None]:
+                point = list()
+                k = 0
+                for a in range(ndim):
+                    if a == axis:
+                        point.append(side)
+                    else:
+                        point.append(0.5 if bits is None else bits[k])
+                        k += 1
+                points.append(point)
+        return np.array(points, dtype=float).T, corner_bits
+
+    def _face_coordinates(self):
+        """The physical coordinates of the face points (see `_face_points`) of all regions.
+
+        Regions of the same batchable mapping class are computed with one call.
+
+        Returns
+        -------
+        xyz :
+            A 3-d array of shape (num_regions, num_points, esd).
+
+        """
+        mf = self._regions._mf
+        ndim = mf.ndim
+        points, _ = self._face_points(ndim)
+        num_points = points.shape[1]
+        num_regions = len(self._regions)
+        xyz = np.empty((num_regions, num_points, mf.esd))
+        for group in mf.ct._group_regions_by_mapping_class(list(self._regions)):
+            if len(group) == 1:
+                i = group[0]
+                values = self._regions[i]._ct.mapping(*points)
+                xyz[i] = np.array([np.asarray(_) for _ in values]).T
+            else:
+                rst = [np.tile(_, len(group)) for _ in points]
+                values = mf.ct._batched_mapping(group, [num_points for _ in group], *rst)
+                values = np.array([np.asarray(_) for _ in values]).reshape(mf.esd, len(group), num_points)
+                xyz[group] = values.transpose(1, 2, 0)
+        return xyz
+
+    def _find_interfaces(self):
+        """"""
+        ndim = self._regions._mf.ndim
+        xyz = self._face_coordinates()
+        num_regions, num_points, esd = xyz.shape
+        _, corner_bits = self._face_points(ndim)
+        num_face_points = len(corner_bits) + 1
+
+        # quantize coordinates.
+        scale = max(float(np.max(np.ptp(xyz.reshape(-1, esd), axis=0))), 1.)
+        keys = np.round(xyz / (scale * self._tolerance)).astype(np.int64)
+        keys = keys.reshape(num_regions, 2 * ndim, num_face_points, esd)
+
+        # hash faces: the sorted corners plus the center identify a face regardless of its orientation.
+        faces = dict()
+        for i in range(num_regions):
+            for j in range(2 * ndim):
+                face_keys = [tuple(_) for _ in keys[i, j]]
+                face_hash = (tuple(sorted(face_keys[:-1])), face_keys[-1])
+                if face_hash in faces:
+                    faces[face_hash].append((i, j))
+                else:
+                    faces[face_hash] = [(i, j)]
+
+        interfaces = dict()
+        for face_hash in faces:
+            region_faces = faces[face_hash]
+            if len(region_faces) == 1:
+                pass  # boundary face
+            elif len(region_faces) == 2:
+                (i0, j0), (i1, j1) = region_faces
+                assert (i0, j0) != (i1, j1), f"trivial check."
+                perm01, flips01 = self._orientation(keys[i0, j0], keys[i1, j1], corner_bits)
+                perm10, flips10 = self._orientation(keys[i1, j1], keys[i0, j0], corner_bits)
+                interfaces[(i0, j0)] = (i1, j1, perm01, flips01)
+                interfaces[(i1, j1)] = (i0, j0, perm10, flips10)
+            else:
+                raise Exception(f"more than two region faces, {region_faces}, are at the same place.")
+        return interfaces
+
+    @staticmethod
+    def _orientation(keys0, keys1, corner_bits):
+        """How the tangential axes of face 0 are mapped to those of face 1."""
+        where1 = dict()
+        for m, bits in enumerate(corner_bits):
+            where1[tuple(keys1[m])] = bits
+        b0 = np.array(where1[tuple(keys0[0])])   # the corner 0 of face 0; its bits are all 0.
+        n = len(b0)
+        perm = list()
+        flips = list()
+        for k in range(n):
+            unit = tuple([1 if _ == k else 0 for _ in range(n)])
+            bk = np.array(where1[tuple(keys0[corner_bits.index(unit)])])
+            diff = np.nonzero(bk != b0)[0]
+            assert len(diff) == 1, f"faces are not conforming."
+            perm.append(int(diff[0]))
+            flips.append(bool(b0[diff[0]] == 1))
+        assert sorted(perm) == list(range(n)), f"faces are not conforming."
+        return tuple(perm), tuple(flips)
@@ -8,6 +8,7 @@ import sys
 if './' not in sys.path:
     sys.path.append('./')
 from src.tools.frozen import Frozen
+from msepy.manifold.regions.interfaces import MsePyRegionInterfaces
 
 
 class MseManifoldRegions(Frozen):
@@ -20,6 +21,7 @@ class MseManifoldRegions(Frozen):
         self._regions = dict()
         self._map = None  # normally, only regions of the highest dimensional manifold has a region map.
         self._is_structured_regions = None
+        self._interfaces = None
         self._freeze()
 
     @property
@@ -31,8 +33,11 @@ class MseManifoldRegions(Frozen):
         }  # this type of region map means it has a structured distribution of regions
         and int means this interface is in-between region, None means it is at manifold boundary.
         {
-            0: ""
-        }
+            0: None,
+            1: None,
+            ...
+        }  # this type of region map means the neighbours are not given; they will be found geometrically by
+        `self.interfaces` and regions can be glued in arbitrary orientations.
         """
         return self._map  # ***
 
@@ -61,9 +66,20 @@ class MseManifoldRegions(Frozen):
                         assert map_neighbor[_j] == i, \
                             f"region maps illegal; map[{i}][{j}] refers to region #{mp}, " \
                             f"but map[{mp}][{_j}] does not refer to region #{i}."
+        elif map_type == 1:  # the second type; neighbours are found by `self.interfaces`.
+            for i in self:
+                assert i in region_map and region_map[i] is None, \
+                    f"region maps illegal; map[{i}] must be None for an unstructured region map."
         else:
             raise NotImplementedError()
 
+    @property
+    def interfaces(self):
+        """The region-interface graph found by matching region faces geometrically."""
+        if self._interfaces is None:
+            self._interfaces = MsePyRegionInterfaces(self)
+        return self._interfaces
+
     def is_structured(self):
         """Return True if we have a structured region map; `map_type=0` in `_check_map`;
         map is a 2d-array of integers and None.
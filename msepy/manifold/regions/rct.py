@@ -15,7 +15,7 @@ class MsePyRegionCoordinateTransformation(Frozen):
 
         self._mapping = mapping
         if Jacobian_matrix is None:
-            raise NotImplementedError(f"Implement a numerical Jacobian_matrix")
+            self._Jacobian_matrix = _MsePyRegionNumericalJacobian(mapping)
         else:
             self._Jacobian_matrix = Jacobian_matrix
         self.mtype = mtype  # if it is None, we will set a unique one.
@@ -31,6 +31,44 @@ class MsePyRegionCoordinateTransformation(Frozen):
         """"""
         return self._Jacobian_matrix
 
+    def _mapping_and_Jacobian(self, *rst):
+        """Return the mapping and the Jacobian matrix together. If the mapping object has a fused
+        `mapping_and_Jacobian` method, use it.
+        """
+        instance = getattr(self._mapping, '__self__', None)
+        fused = getattr(instance, 'mapping_and_Jacobian', None)
+        if fused is not None and self._mapping.__name__ == 'mapping' and \
+                getattr(self._Jacobian_matrix, '__self__', None) is instance:
+            return fused(*rst)
+        else:
+            return self.mapping(*rst), self.Jacobian_matrix(*rst)
+
+    @property
+    def _batchable_mapping(self):
+        """If the mapping is a method of an object whose class can evaluate the mappings of many of its
+        instances at once (through the static method `_batched_mapping(instances, counts, *rst)`), return
+        this object. Otherwise, return None.
+        """
+        instance = getattr(self._mapping, '__self__', None)
+        if instance is not None and hasattr(instance.__class__, '_batched_mapping') and \
+                self._mapping.__name__ == 'mapping':
+            return instance
+        else:
+            return None
+
+    @property
+    def _affine_mapping(self):
+        """If the mapping is a method of an object whose class can tell whether the mappings of its instances
+        are affine (through the static method `_batched_affine(instances, counts)`, which returns None if they
+        are not), return this object. Otherwise, return None.
+        """
+        instance = getattr(self._mapping, '__self__', None)
+        if instance is not None and hasattr(instance.__class__, '_batched_affine') and \
+                self._mapping.__name__ == 'mapping':
+            return instance
+        else:
+            return None
+
     @property
     def mtype(self):
         """"""
@@ -50,6 +88,119 @@ class MsePyRegionCoordinateTransformation(Frozen):
         self._mtype = mtp
 
 
+class _MsePyRegionNumericalJacobian(Frozen):
+    """The numerical Jacobian matrix of a region mapping.
+
+    All partial derivatives at all points are computed with ONE (batched) call of the mapping. If the
+    mapping supports complex input, we use the complex-step derivative. Otherwise, we use the 4th-order
+    central difference.
+
+    Set `method` ('complex' or 'central') and `step` to control it; `None` means automatic.
+    """
+
+    _central_offsets = (2, 1, -1, -2)
+    _central_weights = (-1 / 12, 8 / 12, -8 / 12, 1 / 12)
+
+    def __init__(self, mapping, method=None, step=None):
+        """"""
+        self._mapping = mapping
+        self.method = method
+        self.step = step
+        self._freeze()
+
+    @property
+    def method(self):
+        """'complex', 'central' or None (not decided yet)."""
+        return self._method
+
+    @method.setter
+    def method(self, method):
+        """"""
+        assert method in (None, 'complex', 'central'), f"method={method} is illegal."
+        self._method = method
+
+    @property
+    def step(self):
+        """The step; None means the default one of the method."""
+        return self._step
+
+    @step.setter
+    def step(self, step):
+        """"""
+        assert step is None or step > 0, f"step={step} is illegal, it must be positive."
+        self._step = step
+
+    def __call__(self, *rst):
+        """ `*rst` be in [0, 1]. """
+        rst = [np.asarray(_, dtype=float) for _ in rst]
+        if self._method is None:
+            self._method = self._detect_method(len(rst))
+        else:
+            pass
+
+        if self._method == 'complex':
+            return self._complex_step(*rst)
+        else:
+            return self._central_difference(*rst)
+
+    def _complex_step(self, *rst, step=None):
+        """d(x_i)/d(r_j) = Im(x_i(r + i h e_j)) / h; all `j` in one mapping call."""
+        if step is None:
+            step = 1e-20 if self._step is None else self._step
+        ndim = len(rst)
+        inputs = list()
+        for k, r in enumerate(rst):
+            _ = np.empty((ndim,) + r.shape, dtype=complex)
+            _[...] = r
+            _[k] += 1j * step  # perturbation #k only affects `r_k`.
+            inputs.append(_)
+        xyz = self._mapping(*inputs)
+        return tuple([
+            tuple([np.imag(x[j]) / step for j in range(ndim)]) for x in xyz
+        ])
+
+    def _central_difference(self, *rst, step=None):
+        """The 4th-order central difference; all `j` in one mapping call."""
+        if step is None:
+            step = np.finfo(float).eps ** (1 / 5) if self._step is None else self._step
+        ndim = len(rst)
+        offsets = self._central_offsets
+        num_offsets = len(offsets)
+        inputs = list()
+        for k, r in enumerate(rst):
+            _ = np.empty((ndim * num_offsets,) + r.shape)
+            _[...] = r
+            for m, offset in enumerate(offsets):
+                _[k * num_offsets + m] += offset * step
+            inputs.append(_)
+        xyz = self._mapping(*inputs)
+
+        J = list()
+        for x in xyz:
+            J_i = list()
+            for j in range(ndim):
+                x_j = x[j * num_offsets: (j + 1) * num_offsets]
+                J_i.append(np.tensordot(self._central_weights, x_j, axes=(0, 0)) / step)
+            J.append(tuple(J_i))
+        return tuple(J)
+
+    def _detect_method(self, ndim):
+        """Use the complex-step if the mapping works for complex input and agrees with the central
+        difference at some probe points.
+        """
+        probe = [np.array([0.1234, 0.5678, 0.9012]) for _ in range(ndim)]
+        try:
+            J_complex = self._complex_step(*probe)
+        except (TypeError, ValueError):
+            return 'central'
+        J_central = self._central_difference(*probe)
+        for J_complex_i, J_central_i in zip(J_complex, J_central):
+            for J_complex_ij, J_central_ij in zip(J_complex_i, J_central_i):
+                if not np.allclose(J_complex_ij, J_central_ij, rtol=1e-6, atol=1e-6):
+                    return 'central'
+        return 'complex'
+
+
 class _MsePyRegionMtype(Frozen):
     """"""
     def __init__(self, indicator, parameters):
@@ -80,9 +231,35 @@ class _MsePyRegionMtype(Frozen):
             return self.signature == other.signature
 
     def _distribute_to_element(self, layout, element_numbering):
-        """"""
-        element_mtype_dict = dict()
+        """Return a dict whose keys are the metric signatures of elements and whose values are 1-d int
+        arrays of (increasing) element numbers of that metric.
+        """
+        labels, group_ids = self._group_elements(layout, element_numbering)
+        numbering = element_numbering.ravel('F')
+        group_ids = group_ids.ravel('F')
+        order = np.argsort(group_ids, kind='stable')  # stable: members keep their increasing order.
+        members = np.split(numbering[order], np.cumsum(np.bincount(group_ids, minlength=len(labels)))[:-1])
+        return dict(zip(labels, members))
+
+    def _group_elements(self, layout, element_numbering):
+        """Group elements of this region according to their metric.
+
+        Parameters
+        ----------
+        layout :
+            The element layout of this region.
+        element_numbering :
+            The element numbering of this region.
 
+        Returns
+        -------
+        labels : tuple
+            `labels[g]` is the metric signature, for example, 'Linear:x0.33333y0.5', of group #g.
+        group_ids :
+            An int array of the shape of `element_numbering`. `group_ids[i, j, ...]` is the group the
+            element `element_numbering[i, j, ...]` belongs to.
+
+        """
         if self._indicator == 'Unique':
             raise Exception(f"Unique region cannot distribute metric type to elements.")
 
@@ -90,63 +267,35 @@ class _MsePyRegionMtype(Frozen):
             # parameters are for example: ['x1.33333', 'y1.666666', ...]
             assert len(layout) == len(self._parameters), f"layout or parameters dimensions wrong."
             assert len(layout) == element_numbering.ndim, f"layout or element_numbering dimensions wrong."
-
-            LayOut = [np.round(_, 5) for _ in layout]
             parameters = self._parameters
             axis = [_[0] for _ in parameters]
             para = [float(_[1:]) for _ in parameters]
 
-            if len(LayOut) == 1:
-                for i in range(len(LayOut[0])):
-                    Li = LayOut[0][i]
-                    pi = para[0] * Li
-                    pi = round(pi, 5)
-                    key = 'Linear:' + axis[0] + str(pi)
-
-                    element_number = element_numbering[i, ]
-                    if key in element_mtype_dict:
-                        element_mtype_dict[key].append(element_number)
-                    else:
-                        element_mtype_dict[key] = [element_number, ]
-
-            elif len(LayOut) == 2:
-                for j in range(len(LayOut[1])):
-                    for i in range(len(LayOut[0])):
-
-                        Li, Lj = LayOut[0][i], LayOut[1][j]
-                        pi, pj = para[0] * Li, para[1] * Lj
-                        pi = round(pi, 5)
-                        pj = round(pj, 5)
-                        key = 'Linear:' + axis[0] + str(pi) + axis[1] + str(pj)
-
-                        element_number = element_numbering[i, j]
-                        if key in element_mtype_dict:
-                            element_mtype_dict[key].append(element_number)
-                        else:
-                            element_mtype_dict[key] = [element_number, ]
-
-            elif len(LayOut) == 3:
-                for k in range(len(LayOut[2])):
-                    for j in range(len(LayOut[1])):
-                        for i in range(len(LayOut[0])):
-
-                            Li, Lj, Lk = LayOut[0][i], LayOut[1][j], LayOut[2][k]
-                            pi, pj, pk = para[0] * Li, para[1] * Lj, para[2] * Lk
-                            pi = round(pi, 5)
-                            pj = round(pj, 5)
-                            pk = round(pk, 5)
-                            key = 'Linear:' + axis[0] + str(pi) + axis[1] + str(pj) + axis[2] + str(pk)
-
-                            element_number = element_numbering[i, j, k]
-                            if key in element_mtype_dict:
-                                element_mtype_dict[key].append(element_number)
-                            else:
-                                element_mtype_dict[key] = [element_number, ]
-
-            else:
-                raise NotImplementedError()
+            # quantize the element sizes along each axis, and find the distinct sizes along each axis.
+            unique_sizes = list()
+            codes = 0
+            stride = 1
+            for i, lyt in enumerate(layout):
+                sizes = np.round(para[i] * np.round(lyt, 5), 5)
+                unique_sizes_i, inverse = np.unique(sizes, return_inverse=True)
+                unique_sizes.append(unique_sizes_i)
+                shape = [1 for _ in layout]
+                shape[i] = len(lyt)
+                codes = codes + inverse.reshape(shape) * stride  # broadcast to (n0, n1, ...)
+                stride *= len(unique_sizes_i)
+
+            # an element is identified by its (quantized) sizes along all axes.
+            unique_codes, group_ids = np.unique(codes, return_inverse=True)
+            group_ids = group_ids.reshape(element_numbering.shape)
+            sizes_indices = np.unravel_index(unique_codes, [len(_) for _ in unique_sizes], order='F')
+            labels = list()
+            for g in range(len(unique_codes)):
+                key = 'Linear:'
+                for i, ui in enumerate(unique_sizes):
+                    key += axis[i] + str(round(float(ui[sizes_indices[i][g]]), 5))
+                labels.append(key)
+
+            return tuple(labels), group_ids
 
         else:
             raise NotImplementedError(f"Not implemented for indicator = {self._indicator}")
-
-        return element_mtype_dict
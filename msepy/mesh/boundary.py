@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import sys
+if './' not in sys.path:
+    sys.path.append('./')
+
+import numpy as np
+from src.tools.frozen import Frozen
+from msepy.mesh.elements import _compact_int_dtype
+
+
+class MsePyMeshBoundaryFaces(Frozen):
+    """The (element, face) pairs on the boundary of a mesh, found in one pass over the `-1` entries of the
+    element map. Face #j of an element is numbered like the element map, `[x-, x+, y-, y+, ...]`.
+
+    Boundary faces are split into sections: section `(i, j)` is the boundary faces on face #j of region #i.
+    They are stored CSR-like, the faces of section #s are `self.elements[self._offsets[s]:self._offsets[s+1]]`
+    and `self.faces[...]` (in increasing element numbers), so a section is a view, and we never scan the
+    whole mesh again.
+
+    Sections are only the region faces. The boundary sections defined by `BoundaryCondition.partition` are
+    abstract (symbolic) sub-manifolds with no geometry in msepy, so they are not linked to these sections; the
+    caller maps a boundary section to the region faces it covers and gathers them with `sections`.
+    """
+
+    def __init__(self, mesh):
+        """"""
+        elements = mesh.elements
+        num_faces = 2 * mesh.ndim
+        boundary_elements, boundary_faces = np.nonzero(elements.map < 0)
+        regions, _ = elements._find_region_and_local_indices_of_elements(boundary_elements)
+
+        # an element face on the boundary is on the same face of the region the element is in.
+        section_codes = regions * num_faces + boundary_faces
+        order = np.lexsort((boundary_elements, section_codes))
+        section_codes = section_codes[order]
+        codes, starts = np.unique(section_codes, return_index=True)
+
+        dtype = _compact_int_dtype(max(elements._num, num_faces))
+        self._elements = boundary_elements[order].astype(dtype)
+        self._faces = boundary_faces[order].astype(np.int8)
+        self._offsets = np.append(starts, len(order)).astype(dtype)
+        self._sections = dict()
+        for s, code in enumerate(codes.tolist()):
+            self._sections[divmod(code, num_faces)] = s
+        self._freeze()
+
+    @property
+    def elements(self):
+        """The elements of all boundary faces (section by section)."""
+        return self._elements
+
+    @property
+    def faces(self):
+        """The local faces of all boundary faces (section by section)."""
+        return self._faces
+
+    @property
+    def num_faces(self):
+        """How many boundary faces."""
+        return len(self._elements)
+
+    def __iter__(self):
+        """Go through all sections, `(region, region_face)`."""
+        for section in self._sections:
+            yield section
+
+    def __len__(self):
+        """How many sections."""
+        return len(self._sections)
+
+    def __contains__(self, section):
+        """Check if `section`, `(region, region_face)`, is a boundary section."""
+        return section in self._sections
+
+    def __getitem__(self, section):
+        """The elements and local faces of boundary section `(region, region_face)`; two 1-d int arrays (views)."""
+        s = self._sections[section]
+        start, end = self._offsets[s], self._offsets[s + 1]
+        return self._elements[start:end], self._faces[start:end]
+
+    def sections(self, *sections):
+        """The elements and local faces of the union of `sections`."""
+        if len(sections) == 1:
+            return self[sections[0]]
+        else:
+            data = [self[_] for _ in sections]
+            return np.concatenate([_[0] for _ in data]), np.concatenate([_[1] for _ in data])
+
+
+if __name__ == '__main__':
+    # python msepy/mesh/boundary.py
+    import __init__ as ph
+    space_dim = 3
+    ph.config.set_embedding_space_dim(space_dim)
+
+    manifold0 = ph.manifold(space_dim)
+    mesh0 = ph.mesh(manifold0)
+    manifold1 = ph.manifold(space_dim)
+    mesh1 = ph.mesh(manifold1)
+    msepy, obj = ph.fem.apply('msepy', locals())
+    msepy.config(obj['manifold0'])('crazy', c=0.1)
+    msepy.config(obj['mesh0'])([3, 4, 5])
+    msepy.config(obj['manifold1'])('twisted_blocks', n=3)
+    msepy.config(obj['mesh1'])({0: [2, 3, 4], 1: [4, 3, 2], 2: [2, 3, 4]})
+
+    for i in range(2):
+        msh = obj[f'mesh{i}']
+        element_map = msh.elements.map
+        boundary_faces = msh.boundary_faces
+        # every -1 of the element map is exactly one boundary face.
+        assert boundary_faces.num_faces == np.sum(element_map == -1), f"amount of boundary faces wrong."
+        assert np.all(element_map[boundary_faces.elements, boundary_faces.faces] == -1), f"not boundary faces."
+        pairs = set(zip(boundary_faces.elements.tolist(), boundary_faces.faces.tolist()))
+        assert len(pairs) == boundary_faces.num_faces, f"repeated boundary faces."
+        # the sections split the boundary faces.
+        assert sum([len(boundary_faces[_][0]) for _ in boundary_faces]) == boundary_faces.num_faces
+        assert len(boundary_faces.sections(*boundary_faces)[0]) == boundary_faces.num_faces
+        print(len(boundary_faces), 'sections,', boundary_faces.num_faces, 'boundary faces.')
+    # one region: the 6 sections of the box have 4*5, 4*5, 3*5, 3*5, 3*4 and 3*4 faces.
+    sections = obj['mesh0'].boundary_faces
+    assert [len(sections[(0, j)][0]) for j in range(6)] == [20, 20, 15, 15, 12, 12], f"sections wrong."
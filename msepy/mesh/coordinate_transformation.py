@@ -9,7 +9,15 @@ if './' not in sys.path:
 
 from src.tools.frozen import Frozen
 import numpy as np
-from typing import Dict
+from msepy.mesh.jacobian import MsePyMeshJacobian
+
+from itertools import count
+from msepy.tools.cache import array_fingerprint, shared_cache
+from msepy.tools.quadrature import MsePyQuadrature
+
+_default_chunk_values = 2 ** 20  # default amount of values (of an array) in a chunk.
+
+_mesh_ids = count()  # meshes are told apart in `shared_cache` by these (not by `id`, which could be reused).
 
 
 class MsePyMeshCoordinateTransformation(Frozen):
@@ -18,151 +26,487 @@ class MsePyMeshCoordinateTransformation(Frozen):
     def __init__(self, mesh):
         """"""
         self._mesh = mesh
-        self.___cache_mapping_od___ = dict()  # cache #1 for mapping.
-        self.___cache_JM_od___ = dict()  # cache #1 for mapping.
+        # the centers and half sizes of elements of region layouts (shared by all meshes, keys are
+        # `('layout', fingerprint)`) and the Jacobian matrices of this mesh (keys start with `self._cache_prefix`)
+        # are in the one cache of msepy, so they share its byte budget, see `msepy.tools.cache.set_cache_limit`.
+        self._cache = shared_cache
+        # the stacked centers and half sizes of elements of groups of regions are of this mesh as well.
+        self._cache_prefix = ('mesh', next(_mesh_ids))
         self._freeze()
 
-    def mapping(self, *xi_et_sg, regions=None):
-        """The mapping for elements in regions."""
+    def mapping(self, *xi_et_sg, regions=None, out=None):
+        """The mapping for elements in regions.
+
+        Parameters
+        ----------
+        xi_et_sg :
+            The reference coordinates, arrays of the same shape, `points_shape`.
+        regions :
+            None (all regions) or an int (one region). For one region, elements are in the local numbering
+            of the region, i.e., the order of `elements._numbering[i].ravel('F')`.
+        out :
+            Optional. A list of `esd` float arrays, each of shape `points_shape + (num_elements,)` where
+            `num_elements` is the amount of elements in `regions`. If it is given, the results are written
+            into it (and it is returned). Affine regions (for example, 'Linear' ones) are evaluated directly
+            into it, so no array of that size is allocated; other regions are evaluated by their mappings and
+            then copied into it.
+
+        """
+        assert len(xi_et_sg) == self._mesh.ndim, f"I need {self._mesh.ndim} reference coordinates."
         if regions is None:
-            regions = range(0, len(self._mesh.manifold.regions))
+            renumbering = self._mesh.elements._renumbering
+            if renumbering is None:
+                regions = range(0, len(self._mesh.manifold.regions))
+            else:
+                all_regions = range(0, len(self._mesh.manifold.regions))
+                geometry = self._affine_geometry(all_regions, renumbered=True)
+                if geometry is not None:  # the element geometry is already in the renumbered order.
+                    return self._evaluate_affine(geometry, *xi_et_sg, out=self._check_out(out, xi_et_sg))
+                else:  # compute in the natural numbering, then permute.
+                    natural = self.mapping(*xi_et_sg, regions=all_regions)
+                    if out is None:
+                        out = [np.empty_like(_) for _ in natural]
+                    else:
+                        self._check_out(out, xi_et_sg)
+                    for j, axis_value in enumerate(natural):
+                        out[j][..., renumbering] = axis_value
+                    return out
+        elif isinstance(regions, range):  # all regions in the natural numbering.
+            pass
         elif isinstance(regions, int):
             regions = [regions]
         else:
             raise Exception(f"pls compute mapping for one region or all regions!")
 
-        elements = self._mesh.elements
-        origin = elements._origin
-        delta = elements._delta
-        _xyz = dict()
+        # regions whose mappings are of the same (batchable) class are computed with one call.
+        groups = self._mesh.manifold.ct._group_regions_by_mapping_class(regions)
+        if out is None and len(groups) == 1:
+            return self._mapping_of_regions(groups[0], *xi_et_sg)
+        else:
+            out = self._check_out(out, xi_et_sg, regions=regions)
 
+        start = dict()  # where the elements of each region start in `out`.
+        current = 0
+        for i in regions:
+            start[i] = current
+            current += self._num_local_elements(i)
+
+        for group in groups:
+            geometry = self._affine_geometry(group)
+            group_start = 0
+            if geometry is not None:  # write into `out` region by region.
+                center, half_delta = geometry
+                for i in group:
+                    end = group_start + self._num_local_elements(i)
+                    self._evaluate_affine(
+                        ([_[group_start:end] for _ in center], [_[group_start:end] for _ in half_delta]),
+                        *xi_et_sg,
+                        out=[_[..., start[i]:start[i] + end - group_start] for _ in out]
+                    )
+                    group_start = end
+            else:
+                xyz = self._mapping_of_regions(group, *xi_et_sg)
+                for i in group:
+                    num_local_elements = self._num_local_elements(i)
+                    for j, axis_value in enumerate(xyz):  # axis_value, elements
+                        out[j][..., start[i]:start[i] + num_local_elements] = \
+                            axis_value[..., group_start:group_start + num_local_elements]
+                    group_start += num_local_elements
+
+        return out
+
+    def _check_out(self, out, xi_et_sg, regions=None):
+        """Check `out` of `mapping` for elements in `regions` (None for all elements), or make it if it is None."""
+        if regions is None:
+            num_elements = self._mesh.elements._num
+        else:
+            num_elements = sum([self._num_local_elements(i) for i in regions])
+        shape = np.shape(xi_et_sg[0]) + (num_elements,)
+        if out is None:
+            out = [np.empty(shape) for _ in range(self._mesh.esd)]
+        else:
+            assert len(out) == self._mesh.esd, f"out must be a list of {self._mesh.esd} arrays."
+            for _ in out:
+                assert _.shape == shape, f"out shape = {_.shape} wrong, it must be {shape}."
+        return out
+
+    def mapping_chunks(self, *xi_et_sg, chunk_size=None):
+        """Like `mapping`, but go through all elements chunk by chunk such that the memory is bounded.
+
+        Parameters
+        ----------
+        xi_et_sg :
+            The reference coordinates, arrays of the same shape, `points_shape`.
+        chunk_size :
+            At most how many elements in a chunk. If it is None, we use chunks of about
+            `_default_chunk_values` values per array.
+
+        Yields
+        ------
+        elements : range or 1-d int array
+            The elements of this chunk; an int array when the elements are renumbered.
+        xyz :
+            A list of `esd` arrays of shape `points_shape + (len(element_range),)`.
+
+        """
         assert len(xi_et_sg) == self._mesh.ndim, f"I need {self._mesh.ndim} reference coordinates."
+        for i, local_elements, elements in self._element_chunks(np.size(xi_et_sg[0]), chunk_size):
+            md_ref_coo = self._reference_coordinates_in_region(i, *xi_et_sg, local_elements=local_elements)
+            xyz = self._mesh.manifold.ct.mapping(*md_ref_coo, regions=i)[i]
+            yield elements, xyz
+
+    def Jacobian_matrix_chunks(self, *xi_et_sg, chunk_size=None):
+        """Like `mapping_chunks`, but for the Jacobian matrix of each element.
+
+        Yields
+        ------
+        elements : range or 1-d int array
+            The elements of this chunk.
+        jm :
+            A stacked array, `(esd, ndim, *points_shape, len(elements))`, like `MsePyMeshJacobian.matrix`;
+            `jm[i, j]` is d(x_i)/d(xi_j) (zeros where the region Jacobian matrix is `0`).
 
-        for i in regions:
-            key = elements._layout_cache_key[i]
-            if key in self.___cache_mapping_od___:
-                ori, dta, num_local_elements = self.___cache_mapping_od___[key]
+        """
+        assert len(xi_et_sg) == self._mesh.ndim, f"I need {self._mesh.ndim} reference coordinates."
+        esd, ndim = self._mesh.esd, self._mesh.ndim
+        for i, local_elements, elements in self._element_chunks(np.size(xi_et_sg[0]), chunk_size):
+            md_ref_coo = self._reference_coordinates_in_region(i, *xi_et_sg, local_elements=local_elements)
+            jm = self._mesh.manifold.ct.Jacobian_matrix(*md_ref_coo, regions=i)[i]
+            half_delta = self._center_and_half_delta(i)[1]
+            JM = np.zeros((esd, ndim) + np.shape(md_ref_coo[0]))
+            for m, jm_m in enumerate(jm):
+                for j, jm_mj in enumerate(jm_m):
+                    if isinstance(jm_mj, int) and jm_mj == 0:
+                        pass
+                    else:
+                        JM[m, j] = jm_mj * half_delta[j][local_elements]
+            yield elements, JM
+
+    def _element_chunks(self, num_points, chunk_size):
+        """Split elements of all regions into chunks, a chunk never crosses regions.
+
+        Yields
+        ------
+        i :
+            The region the chunk is in.
+        local_elements : slice
+            The local elements of the chunk in region #i.
+        elements : range or 1-d int array
+            The (global) elements of the chunk; an int array when the elements are renumbered.
+
+        """
+        if chunk_size is None:
+            chunk_size = max(1, _default_chunk_values // max(1, num_points))
+        else:
+            assert chunk_size % 1 == 0 and chunk_size >= 1, f"chunk_size={chunk_size} wrong, must be int >= 1."
+            chunk_size = int(chunk_size)
+        num_accumulation = self._mesh.elements._num_accumulation
+        renumbering = self._mesh.elements._renumbering
+        for i in range(len(self._mesh.manifold.regions)):
+            num_local_elements = self._num_local_elements(i)
+            for start in range(0, num_local_elements, chunk_size):
+                end = min(start + chunk_size, num_local_elements)
+                elements = range(num_accumulation[i] + start, num_accumulation[i] + end)
+                if renumbering is None:
+                    yield i, slice(start, end), elements
+                else:
+                    yield i, slice(start, end), renumbering[elements.start:elements.stop]
+
+    def _mapping_of_regions(self, regions, *xi_et_sg):
+        """The mapping for elements in `regions` (a group given by `_group_regions_by_mapping_class` of the
+        manifold ct), their elements are stacked along the last axis in the order of `regions`.
+        """
+        geometry = self._affine_geometry(regions)
+        if geometry is not None:
+            return self._evaluate_affine(geometry, *xi_et_sg)
+        elif len(regions) == 1:
+            i = regions[0]
+            md_ref_coo = self._reference_coordinates_in_region(i, *xi_et_sg)
+            return self._mesh.manifold.ct.mapping(*md_ref_coo, regions=i)[i]
+        else:
+            key = self._cache_prefix + ('group', tuple(regions))
+            if key in self._cache:
+                center, half_delta = self._cache[key]
             else:
-                oi = origin[i]
-                di = delta[i]
-                length = [len(_) for _ in oi]
-
-                if self._mesh.ndim == 1:   # 1-d mapping
-                    ox = oi[0]
-                    dx = di[0]
-                    ori = [ox]
-                    dta = [dx]
-                elif self._mesh.ndim == 2:   # 2-d mapping
-                    ox = np.tile(oi[0], length[1])
-                    dx = np.tile(di[0], length[1])
-                    oy = np.repeat(oi[1], length[0])
-                    dy = np.repeat(di[1], length[0])
-                    ori = [ox, oy]
-                    dta = [dx, dy]
-                elif self._mesh.ndim == 3:    # 3-d mapping
-                    ox = np.tile(np.tile(oi[0], length[1]), length[2])
-                    dx = np.tile(np.tile(di[0], length[1]), length[2])
-                    oy = np.tile(np.repeat(oi[1], length[0]), length[2])
-                    dy = np.tile(np.repeat(di[1], length[0]), length[2])
-                    oz = np.repeat(np.repeat(oi[2], length[1]), length[0])
-                    dz = np.repeat(np.repeat(di[2], length[1]), length[0])
-                    ori = [ox, oy, oz]
-                    dta = [dx, dy, dz]
+                center_and_half_delta = [self._center_and_half_delta(i) for i in regions]
+                center = [np.concatenate([_[0][j] for _ in center_and_half_delta]) for j in range(len(xi_et_sg))]
+                half_delta = [np.concatenate([_[1][j] for _ in center_and_half_delta]) for j in range(len(xi_et_sg))]
+                self._cache[key] = center, half_delta
+            md_ref_coo = self._reference_coordinates(center, half_delta, *xi_et_sg)
+            counts = [self._num_local_elements(i) for i in regions]
+            return self._mesh.manifold.ct._batched_mapping(regions, counts, *md_ref_coo)
+
+    def _affine_geometry(self, regions, renumbered=False):
+        """If the mappings of `regions` (all regions if `renumbered`) are affine, return the centers and half sizes
+        of their elements composed with the region mappings, `(center, half_delta)`, such that
+        `x_j = xi_j * half_delta[j] + center[j]`; otherwise, return None. Elements are in the order of `regions`,
+        or, if `renumbered`, in the numbering of the mesh.
+        """
+        key = self._cache_prefix + ('affine', tuple(regions), renumbered)
+        if key in self._cache:
+            geometry = self._cache[key]
+        elif renumbered:
+            geometry = self._affine_geometry(regions)
+            if geometry is not None:
+                renumbering = self._mesh.elements._renumbering
+                permuted = list()
+                for data in geometry:
+                    permuted.append([np.empty_like(_) for _ in data])
+                    for _, p in zip(data, permuted[-1]):
+                        p[renumbering] = _
+                geometry = tuple(permuted)
+            else:
+                pass
+            self._cache[key] = geometry
+        else:
+            mct = self._mesh.manifold.ct
+            center = [list() for _ in range(self._mesh.ndim)]
+            half_delta = [list() for _ in range(self._mesh.ndim)]
+            geometry = (center, half_delta)
+            for i in regions:
+                num_local_elements = self._num_local_elements(i)
+                scale_shift = mct._batched_affine([i], [num_local_elements])
+                if scale_shift is None:
+                    geometry = None
+                    break
                 else:
-                    raise NotImplementedError()
+                    scale, shift = scale_shift
+                    ci, hi = self._center_and_half_delta(i)
+                    for j in range(self._mesh.ndim):
+                        center[j].append(ci[j] * scale[j] + shift[j])
+                        half_delta[j].append(hi[j] * scale[j])
+            if geometry is not None:
+                geometry = ([np.concatenate(_) for _ in center], [np.concatenate(_) for _ in half_delta])
+            else:
+                pass
+            self._cache[key] = geometry
+        return geometry
 
-                num_local_elements = np.prod(length)
-                self.___cache_mapping_od___[key] = ori, dta, num_local_elements
+    def _evaluate_affine(self, geometry, *xi_et_sg, out=None):
+        """`x_j = xi_j * half_delta[j] + center[j]` for `(center, half_delta) = geometry`, see `_affine_geometry`.
+        If `out` is given, the results are written into it, otherwise new arrays are returned.
+        """
+        center, half_delta = geometry
+        if out is None:
+            out = [np.empty(np.shape(xi_et_sg[0]) + np.shape(center[0])) for _ in center]
+        else:
+            pass
+        for j, ref_coo in enumerate(xi_et_sg):
+            np.multiply(np.asarray(ref_coo)[..., np.newaxis], half_delta[j], out=out[j])
+            out[j] += center[j]
+        return out
+
+    def _mapping_and_Jacobian_of_elements(self, elements, *xi_et_sg):
+        """The mapping and the Jacobian matrix at one point in each of `elements`; point #m is at the
+        reference coordinates `xi_et_sg[:][m]` of element `elements[m]`.
+
+        Parameters
+        ----------
+        elements :
+            A 1-d int array of element numbers; elements can repeat.
+        xi_et_sg :
+            1-d arrays of the same length as `elements`.
+
+        Returns
+        -------
+        xyz :
+            A 2-d array of shape `(esd, len(elements))`.
+        jm :
+            A 3-d array of shape `(esd, ndim, len(elements))`, d(x_i)/d(xi_j).
 
-            md_ref_coo = list()
-            for j, ref_coo in enumerate(xi_et_sg):
-                _ = ref_coo[..., np.newaxis].repeat(num_local_elements, axis=-1)
-                _ = (_ + 1) * 0.5 * dta[j] + ori[j]
-                md_ref_coo.append(_)
+        """
+        elements = np.asarray(elements)
+        table = self._mesh.elements.table
+        num_points = len(elements)
+        in_regions = table.regions[elements]
+        half_delta = 0.5 * table.delta[elements]
+        center = table.origin[elements] + half_delta
+        xyz = np.empty((self._mesh.esd, num_points))
+        jm = np.zeros((self._mesh.esd, self._mesh.ndim, num_points))
+
+        # sort points by region such that each region is evaluated with one call.
+        order = np.argsort(in_regions, kind='stable')
+        regions, starts = np.unique(in_regions[order], return_index=True)
+        ends = np.append(starts[1:], num_points)
+        regions_ct = self._mesh.manifold.regions
+        for r, start, end in zip(regions.tolist(), starts, ends):
+            points = order[start:end]
+            md_ref_coo = [
+                np.asarray(xi)[points] * half_delta[points, j] + center[points, j] for j, xi in enumerate(xi_et_sg)
+            ]
+            x, J = regions_ct[r]._ct._mapping_and_Jacobian(*md_ref_coo)
+            for i, x_i in enumerate(x):
+                xyz[i, points] = x_i
+            for i, J_i in enumerate(J):
+                for j, J_ij in enumerate(J_i):
+                    if isinstance(J_ij, int) and J_ij == 0:
+                        pass
+                    else:
+                        jm[i, j, points] = J_ij * half_delta[points, j]
+        return xyz, jm
 
-            md_ref_coo = self._mesh.manifold.ct.mapping(*md_ref_coo, regions=i)[i]
-            _xyz[i] = md_ref_coo
+    def _num_local_elements(self, i):
+        """The amount of elements in region #i."""
+        return int(np.prod(self._mesh.elements._distribution[i]))
 
-        if len(regions) == 1:
-            return _xyz[0]
+    def _center_and_half_delta(self, i):
+        """The centers and half sizes (along each axis) of all elements in region #i in the reference region.
+
+        They are cached according to the layout of region #i.
+        """
+        elements = self._mesh.elements
+        key = elements._layout_cache_key[i]
+        cached = self._cache.get(('layout', key))
+        if cached is not None:
+            center, half_delta = cached
         else:
-            xyz = [list() for _ in range(len(_xyz[0]))]
-            for i in regions:
-                for j, region_axis_value in enumerate(_xyz[i]):  # axis_value, elements
-                    xyz[j].append(region_axis_value)
-                del _xyz[i]
-            for j, _ in enumerate(xyz):
-                xyz[j] = np.concatenate(list(_), axis=-1)
+            oi = elements._origin[i]
+            di = elements._delta[i]
+            length = [len(_) for _ in oi]
+
+            if self._mesh.ndim == 1:   # 1-d mapping
+                ox = oi[0]
+                dx = di[0]
+                ori = [ox]
+                dta = [dx]
+            elif self._mesh.ndim == 2:   # 2-d mapping
+                ox = np.tile(oi[0], length[1])
+                dx = np.tile(di[0], length[1])
+                oy = np.repeat(oi[1], length[0])
+                dy = np.repeat(di[1], length[0])
+                ori = [ox, oy]
+                dta = [dx, dy]
+            elif self._mesh.ndim == 3:    # 3-d mapping
+                ox = np.tile(np.tile(oi[0], length[1]), length[2])
+                dx = np.tile(np.tile(di[0], length[1]), length[2])
+                oy = np.tile(np.repeat(oi[1], length[0]), length[2])
+                dy = np.tile(np.repeat(di[1], length[0]), length[2])
+                oz = np.repeat(np.repeat(oi[2], length[1]), length[0])
+                dz = np.repeat(np.repeat(di[2], length[1]), length[0])
+                ori = [ox, oy, oz]
+                dta = [dx, dy, dz]
+            else:
+                raise NotImplementedError()
 
-            return xyz
+            # (xi + 1) * 0.5 * delta + origin = xi * half_delta + center
+            half_delta = [0.5 * _ for _ in dta]
+            center = [o + h for o, h in zip(ori, half_delta)]
+            self._cache[('layout', key)] = center, half_delta
+        return center, half_delta
+
+    def _reference_coordinates_in_region(self, i, *xi_et_sg, local_elements=slice(None)):
+        """Map the reference coordinates `xi_et_sg` (in [-1, 1]) into the reference region (in [0, 1])
+        for elements in region #i. The results are of shape `xi_et_sg[0].shape + (num_local_elements,)`.
+
+        When `local_elements` (a slice of the local numbering) is given, only do it for these elements.
+        """
+        center, half_delta = self._center_and_half_delta(i)
+        center = [_[local_elements] for _ in center]
+        half_delta = [_[local_elements] for _ in half_delta]
+        return self._reference_coordinates(center, half_delta, *xi_et_sg)
+
+    @staticmethod
+    def _reference_coordinates(center, half_delta, *xi_et_sg):
+        """`xi_et_sg * half_delta + center` for elements of centers `center` and half sizes `half_delta`."""
+        md_ref_coo = list()
+        for j, ref_coo in enumerate(xi_et_sg):
+            # broadcast (points, 1) against (num_elements,); no repeated copy of `ref_coo`.
+            _ = np.multiply(np.asarray(ref_coo)[..., np.newaxis], half_delta[j])
+            _ += center[j]
+            md_ref_coo.append(_)
+        return md_ref_coo
 
     def Jacobian_matrix(self, *xi_et_sg):
         """The Jacobian matrix for each element.
 
-        As it is computed through element index mapping, it will be computed for all elements.
-        """
-        eim = self._mesh.elements._index_mapping
-        reference_elements = eim._reference_elements
-        reference_delta = eim._reference_delta
-        reference_origin = eim._reference_origin
-        reference_regions = eim._reference_regions
-
-        elements: Dict[int] = dict()  # Dict keys: region index
-        origin: Dict[int] = dict()    # Dict keys: region index
-        delta: Dict[int] = dict()     # Dict keys: region index
-        for i, re in enumerate(reference_elements):
-            region = reference_regions[i]
-            if region not in origin:
-                elements[region] = list()
-                origin[region] = list()
-                delta[region] = list()
-            else:
-                pass
+        As it is computed through element index mapping, it will be computed for all elements. It is
+        computed only for the reference elements and is cached for the reference coordinates `xi_et_sg`.
 
-            elements[region].append(re)
-            origin[region].append(reference_origin[i])
-            delta[region].append(reference_delta[i])
+        Parameters
+        ----------
+        xi_et_sg :
+            The reference coordinates, arrays of the same shape, `points_shape`; or a quadrature
+            (`MsePyQuadrature`), then the points are its `mesh_grid` and its identity is the cache key.
 
-        for r in origin:
-            origin[r] = np.array(origin[r]).T
-            delta[r] = np.array(delta[r]).T
+        Returns
+        -------
+        jm : MsePyMeshJacobian
+            `jm(e)` is the Jacobian matrix of element #e.
 
-        JM = dict()
-        for r in elements:
-            ele = elements[r]
+        """
+        if len(xi_et_sg) == 1 and isinstance(xi_et_sg[0], MsePyQuadrature):
+            key = xi_et_sg[0].key
+            xi_et_sg = xi_et_sg[0].mesh_grid
+        else:
+            key = None
+        assert len(xi_et_sg) == self._mesh.ndim, f"I need {self._mesh.ndim} reference coordinates."
+        if key is None:
+            key = self._xi_et_sg_key(*xi_et_sg)
+        else:
+            pass
+        cached = self._cache.get(self._cache_prefix + ('Jacobian_matrix', key))
+        if cached is not None:
+            return cached
+        else:
+            pass
 
-            ori = origin[r]
-            dta = delta[r]
+        eim = self._mesh.elements._index_mapping
+        points_shape = np.shape(xi_et_sg[0])
+        if self._constant_Jacobian():  # evaluate once (at the element centers) for each reference element.
+            centers = [np.zeros(1) for _ in xi_et_sg]
+            JM = self._Jacobian_matrix_of_groups(np.arange(len(eim)), *centers)[:, :, 0, :]
+            JM = MsePyMeshJacobian(eim, JM, points_shape=points_shape)
+        else:
+            JM = MsePyMeshJacobian(eim, self._Jacobian_matrix_of_groups(np.arange(len(eim)), *xi_et_sg))
+        self._cache[self._cache_prefix + ('Jacobian_matrix', key)] = JM
+        return JM
+
+    def _Jacobian_matrix_of_groups(self, groups, *xi_et_sg):
+        """The Jacobian matrices of the reference elements of `groups` (a 1-d int array),
+        `(esd, ndim, *points_shape, len(groups))`.
+        """
+        eim = self._mesh.elements._index_mapping
+        reference_delta = eim._reference_delta[groups]
+        reference_origin = eim._reference_origin[groups]
+        reference_regions = eim._reference_regions[groups]
+
+        JM = np.zeros((self._mesh.esd, self._mesh.ndim) + np.shape(xi_et_sg[0]) + (len(groups),))
+        for r in np.unique(reference_regions).tolist():
+            in_region = reference_regions == r
+            ori = reference_origin[in_region].T
+            dta = reference_delta[in_region].T
 
             jm = list()
             for j, ref_coo in enumerate(xi_et_sg):
-                _ = ref_coo[..., np.newaxis].repeat(len(ele), axis=-1)
-                _ = (_ + 1) * 0.5 * dta[j] + ori[j]
+                _ = np.multiply(np.asarray(ref_coo)[..., np.newaxis] + 1, 0.5 * dta[j])
+                _ += ori[j]
                 jm.append(_)
 
             jm = self._mesh.manifold.ct.Jacobian_matrix(*jm, regions=r)[r]
 
             ref_Jacobian = dta / 2
-            s0 = len(jm)
-            s1 = len(jm[0])
-            for e in ele:
-                assert e not in JM, f"trivial check, a reference element must appear once."
-                JM[e] = tuple([[0 for _ in range(s0)] for _ in range(s1)])
-
-            for i in range(s0):
-                for j in range(s1):
-                    jm_ij = jm[i][j]
+            for i, jm_i in enumerate(jm):
+                for j, jm_ij in enumerate(jm_i):
                     if isinstance(jm_ij, int) and jm_ij == 0:
-
                         pass
-
                     else:
                         assert jm_ij.__class__.__name__ == 'ndarray', 'Trivial check. Make sure we use ones_like.'
-                        jm_ij *= ref_Jacobian[j]
-                        for k, e in enumerate(ele):
-                            JM[e][i][j] = jm_ij[..., k]
-
-        return self._mesh.elements._index_mapping.distribute_according_to_reference_elements_dict(JM)
+                        JM[i][j][..., in_region] = jm_ij * ref_Jacobian[j]
+        return JM
+
+    def _clear_cache(self):
+        """Remove the cached data of this mesh (for example, when its elements are renumbered)."""
+        self._cache.clear(prefix=self._cache_prefix)
+
+    def _constant_Jacobian(self):
+        """True if the Jacobian matrix is constant in each element, i.e., all regions are 'Linear' (affine)."""
+        regions = self._mesh.manifold.regions
+        return all([regions[i]._ct.mtype._indicator == 'Linear' for i in regions])
+
+    @staticmethod
+    def _xi_et_sg_key(*xi_et_sg):
+        """A key that identifies the reference coordinates `xi_et_sg`."""
+        return array_fingerprint(*[np.asarray(_, dtype=float) for _ in xi_et_sg])
 
 
 if __name__ == '__main__':
@@ -9,6 +9,12 @@ if './' not in sys.path:
 
 import numpy as np
 from src.tools.frozen import Frozen
+from msepy.tools.cache import array_fingerprint
+from msepy.mesh.renumbering import bandwidth, rcm_permutation, hilbert_permutation
+
+
+class MsePyMeshLayoutError(Exception):
+    """Raise when the element layouts of two regions do not match at their interface."""
 
 
 class MsePyMeshElements(Frozen):
@@ -26,6 +32,9 @@ class MsePyMeshElements(Frozen):
         self._num_accumulation = None
         self._index_mapping = None
         self._map = None
+        self._table = None  # the element table, arrays of per-element geometry, see `MsePyMeshElementsTable`.
+        self._renumbering = None  # None, or `_renumbering[n]` is the number of the `n`th element in natural order.
+        self._renumbering_report = None
         self.___layout_cache_key___ = None
         self._freeze()
 
@@ -33,17 +42,97 @@ class MsePyMeshElements(Frozen):
     def map(self):
         return self._map
 
+    @property
+    def table(self):
+        """The element table: `origin`, `delta`, `regions` and `local_indices` of all elements as arrays whose
+        rows are in the element numbering."""
+        return self._table
+
+    def __getitem__(self, i):
+        """A light view of element #i; see `MsePyMeshElement`."""
+        assert i % 1 == 0 and 0 <= i < self._num, f"element #{i} is out of range [0, {self._num})."
+        return MsePyMeshElement(self, int(i))
+
+    def __len__(self):
+        """How many elements?"""
+        return self._num
+
+    def __iter__(self):
+        """Go through all element numbers."""
+        for i in range(self._num):
+            yield i
+
+    @property
+    def bandwidth(self):
+        """The bandwidth, `max |i - j|` over neighbouring elements #i and #j."""
+        return bandwidth(self._map)
+
+    def _renumber(self, method):
+        """Renumber elements to improve the locality; `_numbering`, `_map` and the index mapping are permuted
+        consistently.
+
+        Parameters
+        ----------
+        method :
+            'rcm' (reverse Cuthill-McKee on the element adjacency, it reduces the bandwidth) or 'hilbert'
+            (along the Hilbert curve through the element centers; it improves the spatial locality but usually
+            makes the bandwidth larger, see `hilbert_permutation`).
+
+        Returns
+        -------
+        report : dict
+            The bandwidths before and after the renumbering.
+
+        """
+        bandwidth_before = self.bandwidth
+        if method == 'rcm':
+            permutation = rcm_permutation(self._map)
+        elif method == 'hilbert':
+            xyz = self._mesh.ct.mapping(*[np.zeros(1) for _ in range(self._mesh.ndim)])
+            centers = np.array([np.asarray(_)[0] for _ in xyz]).T  # in the current numbering.
+            permutation = hilbert_permutation(centers)
+        else:
+            raise NotImplementedError(f"renumbering method={method} is not implemented.")
+
+        for i in self._numbering:
+            self._numbering[i] = permutation[self._numbering[i]]
+        element_map = - np.ones_like(self._map)
+        neighbours = self._map >= 0
+        element_map[permutation] = np.where(neighbours, permutation[np.where(neighbours, self._map, 0)], -1)
+        self._map = element_map
+        self._table._permute(permutation)
+        if self._renumbering is None:
+            self._renumbering = permutation
+        else:
+            self._renumbering = permutation[self._renumbering]
+        self._index_mapping = self._generate_indices_mapping_from_layout(self._delta)
+        # data cached in the old numbering.
+        self._mesh.ct._clear_cache()
+        self._mesh._locate = None
+        self._mesh._boundary_faces = None
+        self._mesh._topology = None
+
+        self._renumbering_report = {
+            'method': method,
+            'bandwidth_before': bandwidth_before,
+            'bandwidth_after': self.bandwidth,
+        }
+        return self._renumbering_report
+
     @property
     def _layout_cache_key(self):
         """If the `layout_cache_key` of two regions are the same, we think their element layouts are the same.
 
         Remember, regions of the same layout_cache_key only means their layouts are the same, but their region
         metric can be totally different.
+
+        The keys are fingerprints of the raw bytes of the layouts, so they are the same for regions of the
+        same layout in different meshes.
         """
         if self.___layout_cache_key___ is None:
             self.___layout_cache_key___ = dict()
             for i in self._delta:
-                self.___layout_cache_key___[i] = hash(str(self._delta[i]))
+                self.___layout_cache_key___[i] = array_fingerprint(*self._delta[i])
         return self.___layout_cache_key___
 
     def _generate_elements_from_layout(self, layouts):
@@ -60,11 +149,65 @@ class MsePyMeshElements(Frozen):
         self._check_layouts(layouts)
         self._origin, self._delta, self._distribution, self._nodes = self._parse_origin_and_delta_from_layout(layouts)
         self._numbering, self._num, self._num_accumulation = self._generate_element_numbering_from_layout(layouts)
+        self._table = self._generate_element_table()
+        self._index_mapping = self._generate_indices_mapping_from_layout(layouts)
+        self._map = self._generate_element_map(layouts)
+
+    def _generate_elements_from_refinement(self, parent_elements, factors):
+        """Generate elements by uniformly refining `parent_elements` (of a mesh on the same manifold); each
+        parent element is split into `factors[k]` elements along axis #k.
+
+        The layouts are valid since the parent layouts are, so they are not checked again, and the origins
+        and the nodes are interpolated from the parent ones.
+
+        Returns
+        -------
+        child_to_parent :
+            A 1-d int array, `child_to_parent[c]` is the parent element of element #c.
+        sub_position :
+            A 1-d int array, `sub_position[c]` is the (Fortran-order) position of element #c among the
+            children of its parent.
+
+        """
+        layouts = dict()
+        self._origin = dict()
+        self._nodes = dict()
+        for i in parent_elements._delta:
+            layouts[i] = [np.repeat(d / f, f) for d, f in zip(parent_elements._delta[i], factors)]
+            self._nodes[i] = list()
+            self._origin[i] = list()
+            for origin, d, f in zip(parent_elements._origin[i], parent_elements._delta[i], factors):
+                nodes = (origin[:, np.newaxis] + np.outer(d / f, np.arange(f))).ravel()
+                self._origin[i].append(nodes)
+                self._nodes[i].append(np.append(nodes, 1.))
+        self._delta = layouts
+        self._distribution = {i: [len(_) for _ in layouts[i]] for i in layouts}
+        self._numbering, self._num, self._num_accumulation = self._generate_element_numbering_from_layout(layouts)
+        self._table = self._generate_element_table()
         self._index_mapping = self._generate_indices_mapping_from_layout(layouts)
         self._map = self._generate_element_map(layouts)
 
+        child_to_parent = np.empty(self._num, dtype=_compact_int_dtype(parent_elements._num))
+        sub_position = np.empty(self._num, dtype=_compact_int_dtype(int(np.prod(factors))))
+        ndim = self._mesh.ndim
+        for i in self._numbering:
+            parent = parent_elements._numbering[i]
+            position = 0
+            stride = 1
+            for k, f in enumerate(factors):
+                parent = np.repeat(parent, f, axis=k)
+                shape = [1 for _ in range(ndim)]
+                shape[k] = -1
+                position = position + np.tile(np.arange(f), parent_elements._distribution[i][k]).reshape(shape) * stride
+                stride *= f
+            child_to_parent[self._numbering[i]] = parent
+            sub_position[self._numbering[i]] = position
+        return child_to_parent, sub_position
+
     def _check_layouts(self, layouts):
-        """"""
+        """Check that the layouts of glued regions match at their interfaces, for both structured region maps and
+        unstructured ones (through `regions.interfaces`, so regions glued in any orientation are checked).
+        """
         assert len(layouts) == len(self._mesh.manifold.regions), f"layout length wrong."
         if len(layouts) == 1:
             pass
@@ -79,13 +222,36 @@ class MsePyMeshElements(Frozen):
                             layout_j = layouts[target]
                             ly_i_axis = layout_i[axis]
                             ly_j_axis = layout_j[axis]
-                            try:
-                                np.testing.assert_array_almost_equal(ly_i_axis, ly_j_axis, decimal=5)
-                            except AssertionError:
-                                raise Exception(f"layout along {axis}-axis for "
-                                                f"region #{i} and region #{target} does not match.")
+                            self._check_layout_match(ly_i_axis, ly_j_axis, i, target, axis)
             else:
-                pass
+                ndim = self._mesh.ndim
+                interfaces = self._mesh.manifold.regions.interfaces
+                for i in layouts:
+                    for j in range(2 * ndim):
+                        interface = interfaces[(i, j)]
+                        if interface is None:
+                            pass
+                        else:
+                            neighbor_region, neighbor_face, permutation, flips = interface
+                            tangential = [a for a in range(ndim) if a != j // 2]
+                            neighbor_tangential = [a for a in range(ndim) if a != neighbor_face // 2]
+                            for k, axis in enumerate(tangential):
+                                ly_n_axis = layouts[neighbor_region][neighbor_tangential[permutation[k]]]
+                                if flips[k]:
+                                    ly_n_axis = ly_n_axis[::-1]
+                                else:
+                                    pass
+                                self._check_layout_match(layouts[i][axis], ly_n_axis, i, neighbor_region, axis)
+
+    @staticmethod
+    def _check_layout_match(ly_i_axis, ly_j_axis, i, target, axis):
+        """"""
+        if len(ly_i_axis) == len(ly_j_axis) and np.allclose(ly_i_axis, ly_j_axis, rtol=0, atol=1.5e-5):
+            pass
+        else:
+            raise MsePyMeshLayoutError(
+                f"layout along {axis}-axis for region #{i} and region #{target} does not match."
+            )
 
     def _parse_origin_and_delta_from_layout(self, layouts):
         """"""
@@ -134,6 +300,39 @@ class MsePyMeshElements(Frozen):
         amount_of_elements = int(current_number)
         return element_numbering, amount_of_elements, num_accumulation
 
+    def _generate_element_table(self):
+        """Gather the origins and deltas of all elements (in the natural numbering) into an element table."""
+        regions = self._mesh.manifold.regions
+        ndim = self._mesh.ndim
+        elements = np.arange(self._num)
+        num_accumulation = np.asarray(self._num_accumulation)
+        # `_num_accumulation` is the (sorted) first (natural) element number of each region.
+        in_regions = np.searchsorted(num_accumulation, elements, side='right') - 1
+        local_numbering = elements - num_accumulation[in_regions]
+
+        # numbering of a region is in Fortran order, see `_generate_element_numbering_from_layout`.
+        distribution = np.array([self._distribution[r] for r in regions])
+        strides = np.cumprod(distribution, axis=1) // distribution
+        local_indices = (local_numbering[:, np.newaxis] // strides[in_regions]) % distribution[in_regions]
+
+        origin = np.empty((self._num, ndim))
+        delta = np.empty((self._num, ndim))
+        for i in range(ndim):
+            # stack delta and origin of all regions along axis #i, and gather them in one go.
+            delta_i = [self._delta[r][i] for r in regions]
+            origin_i = [self._origin[r][i] for r in regions]
+            offset = np.cumsum([0, ] + [len(_) for _ in delta_i[:-1]])
+            indices = offset[in_regions] + local_indices[:, i]
+            delta[:, i] = np.concatenate(delta_i)[indices]
+            origin[:, i] = np.concatenate(origin_i)[indices]
+
+        return MsePyMeshElementsTable(
+            origin,
+            delta,
+            in_regions.astype(_compact_int_dtype(len(regions))),
+            local_indices.astype(_compact_int_dtype(int(np.max(distribution)))),
+        )
+
     def _generate_indices_mapping_from_layout(self, layouts):
         """"""
         regions = self._mesh.manifold.regions
@@ -152,95 +351,90 @@ class MsePyMeshElements(Frozen):
             mip = MsePyMeshElementsIndexMapping(self._num)
         else:
 
-            element_mtype_dict = dict()
-
+            labels = dict()  # metric signature -> global group id
+            group_ids = np.zeros(self._num, dtype=int)
             for i in regions:
                 layout_of_region = layouts[i]
                 element_numbering_of_region = self._numbering[i]
                 region = regions[i]
                 ctm = region._ct.mtype
-                r_emd = ctm._distribute_to_element(layout_of_region, element_numbering_of_region)
-                for key in r_emd:
-                    if key in element_mtype_dict:
-                        element_mtype_dict[key].extend(r_emd[key])
+                r_labels, r_group_ids = ctm._group_elements(layout_of_region, element_numbering_of_region)
+                local_to_global = np.zeros(len(r_labels), dtype=int)
+                for g, key in enumerate(r_labels):
+                    if key not in labels:
+                        labels[key] = len(labels)
                     else:
-                        element_mtype_dict[key] = r_emd[key]
-
-            for key in element_mtype_dict:
-                element_mtype_dict[key].sort()
+                        pass
+                    local_to_global[g] = labels[key]
+                group_ids[element_numbering_of_region] = local_to_global[r_group_ids]
+
+            # order groups by their first elements, then members of groups are increasing element numbers.
+            _, first_elements = np.unique(group_ids, return_index=True)
+            group_order = np.argsort(first_elements)
+            labels = np.array(list(labels.keys()), dtype=object)[group_order]
+            renumber = np.empty_like(group_order)
+            renumber[group_order] = np.arange(len(group_order))
+            group_ids = renumber[group_ids]
+            members = np.split(
+                np.argsort(group_ids, kind='stable'),
+                np.cumsum(np.bincount(group_ids))[:-1]
+            )
+            element_mtype_dict = dict(zip(labels, members))
 
             mip = MsePyMeshElementsIndexMapping(element_mtype_dict, self._num)
 
-        reference_delta = list()
-        reference_origin = list()
-        reference_regions = list()
-        for ce in mip._reference_elements:
-            in_region, local_indices = self._find_region_and_local_indices_of_element(ce)
-            reference_regions.append(in_region)
-            delta_s = self._delta[in_region]
-            origin_s = self._origin[in_region]
-            rd = list()
-            ro = list()
-            for i, index in enumerate(local_indices):
-                rd.append(delta_s[i][index])
-                ro.append(origin_s[i][index])
-            reference_delta.append(rd)
-            reference_origin.append(ro)
-        mip._reference_delta = tuple(reference_delta)   # not need to convert to array
-        mip._reference_origin = tuple(reference_origin)   # not need to convert to array
-        mip._reference_regions = tuple(reference_regions)  # not need to convert to array
+        reference_elements = mip._reference_elements
+        mip._reference_delta = self._table.delta[reference_elements]
+        mip._reference_origin = self._table.origin[reference_elements]
+        mip._reference_regions = self._table.regions[reference_elements].astype(mip._offsets.dtype)
 
         return mip
 
     def _find_region_and_local_indices_of_element(self, i):
-        """
+        """Find the region element #i is in and its local indices in that region.
 
         Parameters
         ----------
-        i
+        i : int
+            The element number.
 
         Returns
         -------
+        in_region : int
+        indices : list
+            The local indices, `[i, j, k]`, of element #i in region #`in_region`.
 
         """
-        assert 0 <= i < self._num, f"i={i} wrong, I have {self._num} elements, i must be in [0, {self._num}]."
         assert i % 1 == 0, f"i must be integer."
-        in_region = -1
-        num_regions = len(self._mesh.manifold.regions)
-        for j, na in enumerate(self._num_accumulation):
-            if j == num_regions - 1:  # the last region.
-                in_region = j
-                break
-            else:
-                if na <= i < self._num_accumulation[j+1]:
-                    in_region = j
-                    break
-                else:
-                    pass
-
-        assert in_region != -1, f"must have found a region."
-
-        local_numbering = i - self._num_accumulation[in_region]
-        # numbering = self._numbering[in_region]
-        dis = self._distribution[in_region]
-
-        ndim = len(dis)
+        in_region, indices = self._find_region_and_local_indices_of_elements([int(i), ])
+        return int(in_region[0]), indices[0].tolist()
 
-        indices = list()
-        for _ in range(ndim-1):
-            n = ndim - 1 - _
+    def _find_region_and_local_indices_of_elements(self, elements):
+        """Batch version of `_find_region_and_local_indices_of_element`.
 
-            num_layer = np.prod(dis[:n])
-
-            indices.append(local_numbering // num_layer)
-
-            local_numbering = local_numbering % num_layer
-
-        indices.append(local_numbering)
+        Parameters
+        ----------
+        elements :
+            A 1-d integer array (or list) of element numbers.
 
-        indices = indices[::-1]
+        Returns
+        -------
+        in_regions :
+            1-d int array, `in_regions[m]` is the region element `elements[m]` is in.
+        local_indices :
+            2-d int array of shape `(len(elements), ndim)`, `local_indices[m]` are the local
+            indices of element `elements[m]` in region `in_regions[m]`.
 
-        return in_region, indices
+        """
+        elements = np.asarray(elements)
+        assert elements.ndim == 1, f"elements must be a 1-d array."
+        if len(elements) > 0:
+            assert np.issubdtype(elements.dtype, np.integer), f"elements must be integers."
+            assert elements.min() >= 0 and elements.max() < self._num, \
+                f"elements wrong, I have {self._num} elements, they must be in [0, {self._num})."
+        else:
+            pass
+        return self._table.regions[elements], self._table.local_indices[elements]
 
     def _generate_element_map(self, layouts):
         """"""
@@ -251,69 +445,87 @@ class MsePyMeshElements(Frozen):
             element_map = self._generate_element_map_form_structured_regions(layouts)
             # return a 2-d array as the element-map
 
-        else:
-            raise NotImplementedError()
-            # should return a 1-d data-structure of strings (which indicate the location of the element.)
+        else:  # `map_type = 1` region map. See `_check_map` of `regions`.
+
+            element_map = self._generate_element_map_form_unstructured_regions(layouts)
+            # return a 2-d array as the element-map
 
         return element_map
 
     def _generate_element_map_form_structured_regions(self, layouts):
-        """"""
+        """The element map is a 2-d int array of shape `(num_elements, 2 * ndim)`, `element_map[e]` is
+        `[#x-, #x+, #y-, #y+, ...]` neighbours of element #e; `-1` means that face is on the boundary.
+        """
         numbering = self._numbering
-        total_num_elements = self._num
+        element_map = self._generate_element_map_inside_regions(layouts)
         ndim = self._mesh.ndim
-        element_map = - np.ones((total_num_elements, 2 * ndim), dtype=int)
 
         for i in numbering:
             _nmb = numbering[i]
-            layout = layouts[i]
-            element_distribution = [len(_) for _ in layout]
-            assert len(layout) == ndim, f"layout[{i}] is wrong."
-
             for axis in range(ndim):
-                for layer in range(element_distribution[axis]):
+                # neighbours across the region faces, one pass per region face.
+                for side in (0, 1):
+                    neighbor_region = self._find_region_on(i, axis, side)
+                    if neighbor_region is None:  # this side is boundary
+                        pass
+                    else:
+                        for_elements = self._find_on_layer(_nmb, axis, -side)
+                        side_elements = self._find_on_layer(numbering[neighbor_region], axis, side - 1)
+                        element_map[for_elements, 2*axis + side] = side_elements
 
-                    for_elements = self._find_on_layer(_nmb, axis, layer)
+        return element_map
 
-                    plus_layer = layer + 1
-                    minus_layer = layer - 1
+    def _generate_element_map_form_unstructured_regions(self, layouts):
+        """Like `_generate_element_map_form_structured_regions`, but the neighbours of regions come from the
+        region-interface graph, `regions.interfaces`, so regions can be glued in arbitrary orientations.
 
-                    if minus_layer < 0:
-                        assert minus_layer == -1, f"safety check"
-                        neighbor_region = self._find_region_on(i, axis, 0)
-                        if neighbor_region is None:  # this side is boundary
-                            minus_side_elements = None
-                        else:
-                            neighbor_region_numbering = numbering[neighbor_region]
-                            minus_side_elements = self._find_on_layer(
-                                neighbor_region_numbering, axis, -1
-                            )
+        `element_map[e][j]` is the element across face #j (of the local axes of the region element #e is in).
+        """
+        numbering = self._numbering
+        element_map = self._generate_element_map_inside_regions(layouts)
+        ndim = self._mesh.ndim
+        interfaces = self._mesh.manifold.regions.interfaces
 
-                    else:
-                        minus_side_elements = self._find_on_layer(_nmb, axis, minus_layer)
+        for i in numbering:
+            _nmb = numbering[i]
+            for j in range(2 * ndim):
+                interface = interfaces[(i, j)]
+                if interface is None:  # this side is boundary
+                    pass
+                else:
+                    axis, side = j // 2, j % 2
+                    neighbor_region, neighbor_face, permutation, flips = interface
+                    for_elements = self._find_on_layer(_nmb, axis, -side)
+                    side_elements = self._find_on_layer(
+                        numbering[neighbor_region], neighbor_face // 2, -(neighbor_face % 2)
+                    )
+                    # orient the neighbor layer like this layer.
+                    side_elements = np.transpose(side_elements, permutation)
+                    side_elements = np.flip(side_elements, axis=[k for k, f in enumerate(flips) if f])
+                    if side_elements.shape != for_elements.shape:  # `_check_layouts` should have found it.
+                        raise MsePyMeshLayoutError(f"layouts of region #{i} and region #{neighbor_region} "
+                                                   f"do not match at their interface.")
+                    element_map[for_elements, j] = side_elements
 
-                    if plus_layer >= element_distribution[axis]:
-                        assert plus_layer == element_distribution[axis], f"safety check"
-                        neighbor_region = self._find_region_on(i, axis, 1)
-                        if neighbor_region is None:  # this side is boundary
-                            plus_side_elements = None
-                        else:
-                            neighbor_region_numbering = numbering[neighbor_region]
-                            plus_side_elements = self._find_on_layer(
-                                neighbor_region_numbering, axis, 0
-                            )
+        return element_map
 
-                    else:
-                        plus_side_elements = self._find_on_layer(_nmb, axis, plus_layer)
+    def _generate_element_map_inside_regions(self, layouts):
+        """Initialize the element map (`-1` everywhere) and fill in the neighbours inside regions."""
+        numbering = self._numbering
+        total_num_elements = self._num
+        ndim = self._mesh.ndim
+        element_map = - np.ones((total_num_elements, 2 * ndim), dtype=int)
 
-                    if minus_side_elements is not None:
-                        element_map[for_elements, 2*axis] = minus_side_elements
-                    else:
-                        pass
-                    if plus_side_elements is not None:
-                        element_map[for_elements, 2*axis + 1] = plus_side_elements
-                    else:
-                        pass
+        for i in numbering:
+            _nmb = numbering[i]
+            assert len(layouts[i]) == ndim == _nmb.ndim, f"layout[{i}] is wrong."
+
+            for axis in range(ndim):
+                # neighbours inside the region: shift the numbering by one layer along `axis`.
+                lower = self._find_on_layer(_nmb, axis, slice(0, -1))
+                upper = self._find_on_layer(_nmb, axis, slice(1, None))
+                element_map[upper, 2*axis] = lower
+                element_map[lower, 2*axis + 1] = upper
 
         return element_map
 
@@ -322,31 +534,148 @@ class MsePyMeshElements(Frozen):
         rmp = self._mesh.manifold.regions.map[i]
         return rmp[2*axis + side]
 
-    def _find_on_layer(self, numbering, axis, layer):
+    @staticmethod
+    def _find_on_layer(numbering, axis, layer):
         """
 
         Parameters
         ----------
-        numbering
-        axis
-        layer
+        numbering :
+            The element numbering of a region.
+        axis :
+            Along which axis?
+        layer :
+            An int or a slice; which layer(s) along `axis`.
 
         Returns
         -------
+        A view of `numbering` on the `layer` along `axis`.
 
         """
-        if axis == 0:
-            return numbering[layer, ...]
-        elif axis == 1:
-            return numbering[:, layer, ...]
-        elif axis == 2:
-            return numbering[:, :, layer, ...]
-        else:
-            raise NotImplementedError()
+        assert 0 <= axis < numbering.ndim, f"axis={axis} is wrong for {numbering.ndim}-d numbering."
+        indices = [slice(None) for _ in range(numbering.ndim)]
+        indices[axis] = layer
+        return numbering[tuple(indices)]
+
+
+def _compact_int_dtype(max_value):
+    """The smallest of int32 and int64 that can hold integers in `[0, max_value]`."""
+    if max_value < np.iinfo(np.int32).max:
+        return np.int32
+    else:
+        return np.int64
+
+
+class MsePyMeshElementsTable(Frozen):
+    """The per-element geometry of all elements as contiguous arrays; row #e is element #e.
+
+    Origins and deltas are in the reference region ([0, 1]^ndim) of the region an element is in, so element #e
+    is the box `origin[e] + [0, delta[e]]`.
+    """
+
+    def __init__(self, origin, delta, regions, local_indices):
+        """"""
+        self._origin = origin
+        self._delta = delta
+        self._regions = regions
+        self._local_indices = local_indices
+        self._freeze()
+
+    @property
+    def origin(self):
+        """2-d float array of shape `(num_elements, ndim)`."""
+        return self._origin
+
+    @property
+    def delta(self):
+        """2-d float array of shape `(num_elements, ndim)`."""
+        return self._delta
+
+    @property
+    def regions(self):
+        """1-d int array, `regions[e]` is the region element #e is in."""
+        return self._regions
+
+    @property
+    def local_indices(self):
+        """2-d int array of shape `(num_elements, ndim)`, the local indices of elements in their regions."""
+        return self._local_indices
+
+    @property
+    def nbytes(self):
+        """The memory footprint (in bytes) of the table."""
+        return self._origin.nbytes + self._delta.nbytes + self._regions.nbytes + self._local_indices.nbytes
+
+    def __len__(self):
+        """How many elements?"""
+        return len(self._regions)
+
+    def _permute(self, permutation):
+        """Element #e becomes element #`permutation[e]`."""
+        for key in ('_origin', '_delta', '_regions', '_local_indices'):
+            old = getattr(self, key)
+            new = np.empty_like(old)
+            new[permutation] = old
+            setattr(self, key, new)
+
+
+class MsePyMeshElement(object):
+    """A light view of an element; it reads the element table and stores nothing else."""
+
+    __slots__ = ('_elements', '_i')
+
+    def __init__(self, elements, i):
+        """"""
+        self._elements = elements
+        self._i = i
+
+    def __repr__(self):
+        """"""
+        return f"<MsePyMeshElement #{self._i} of region #{self.region}>"
+
+    @property
+    def number(self):
+        """The element number."""
+        return self._i
+
+    @property
+    def region(self):
+        """The region this element is in."""
+        return int(self._elements._table.regions[self._i])
+
+    @property
+    def local_indices(self):
+        """The local indices of this element in its region."""
+        return tuple(self._elements._table.local_indices[self._i].tolist())
+
+    @property
+    def origin(self):
+        """The origin in the reference region, a 1-d array (view)."""
+        return self._elements._table.origin[self._i]
+
+    @property
+    def delta(self):
+        """The size in the reference region, a 1-d array (view)."""
+        return self._elements._table.delta[self._i]
+
+    @property
+    def neighbours(self):
+        """The neighbours, `[x-, x+, y-, y+, ...]`, `-1` for boundary faces."""
+        return self._elements._map[self._i]
+
+    @property
+    def metric_group(self):
+        """The metric group (cache index) of this element."""
+        return int(self._elements._index_mapping._e2c[self._i])
 
 
 class MsePyMeshElementsIndexMapping(Frozen):
-    """"""
+    """Map elements into groups (cache indices) of the same metric. Elements of the same group share the
+    metric of the reference (the first) element of the group.
+
+    Groups are stored in CSR style: the members of group #g are
+    `self._members[self._offsets[g]:self._offsets[g+1]]` (in increasing order).
+    """
 
     def __init__(self, ci_ei_map, total_num_elements=None):
         """
@@ -359,37 +688,75 @@ class MsePyMeshElementsIndexMapping(Frozen):
         """
         if isinstance(ci_ei_map, int):  # one to one mapping; each element is unique.
             # in this case, ci_ei_map is the amount of elements.
-            ci_ei_map = np.arange(ci_ei_map)[:, np.newaxis]
-            ei_ci_map = ci_ei_map[:, 0]
+            total_num_elements = ci_ei_map
+            dtype = _compact_int_dtype(total_num_elements)
+            members = np.arange(total_num_elements, dtype=dtype)
+            offsets = np.arange(total_num_elements + 1, dtype=dtype)
+            ei_ci_map = members
+            labels = None
 
         elif isinstance(ci_ei_map, dict):
-            ci_ei_map = tuple(ci_ei_map.values())
-            ei_ci_map = np.zeros(total_num_elements, dtype=int)
-            for i, indices in enumerate(ci_ei_map):
-                ei_ci_map[indices] = i
+            dtype = _compact_int_dtype(total_num_elements)
+            labels = tuple(ci_ei_map.keys())
+            groups = [np.asarray(_, dtype=dtype) for _ in ci_ei_map.values()]
+            members = np.concatenate(groups)
+            counts = np.array([len(_) for _ in groups], dtype=dtype)
+            offsets = np.zeros(len(groups) + 1, dtype=dtype)
+            np.cumsum(counts, out=offsets[1:])
+            assert offsets[-1] == total_num_elements, f"groups must cover all elements."
+            ei_ci_map = np.empty(total_num_elements, dtype=dtype)
+            ei_ci_map[members] = np.repeat(np.arange(len(groups), dtype=dtype), counts)
 
         else:
             raise NotImplementedError()
 
-        self._c2e = ci_ei_map
+        self._members = members
+        self._offsets = offsets
+        self._labels = labels  # the metric signatures of the groups, or None if all elements are unique.
         self._e2c = ei_ci_map
 
         # these elements as representatives will be used to compute the metric for groups.
-        self._reference_elements = list()
-        for ce in self._c2e:
-            self._reference_elements.append(ce[0])
-        self._reference_elements = np.array(self._reference_elements)
-        self._reference_origin = None   # the origin of the representative elements, it is initialized!
-        self._reference_delta = None   # the delta of the representative elements, it is initialized!
-        self._reference_regions = None
+        self._reference_elements = members[offsets[:-1]]
+        self._reference_origin = None   # 2-d float array (num_groups, ndim), it is initialized!
+        self._reference_delta = None   # 2-d float array (num_groups, ndim), it is initialized!
+        self._reference_regions = None   # 1-d int array (num_groups,)
         self.___involved_regions___ = None
         self._freeze()
 
+    def __len__(self):
+        """How many groups?"""
+        return len(self._offsets) - 1
+
+    def _group_members(self, g):
+        """The elements of group #g (a view)."""
+        return self._members[self._offsets[g]:self._offsets[g+1]]
+
+    @property
+    def _c2e(self):
+        """cache_index -> element_indices."""
+        return tuple([self._group_members(g) for g in range(len(self))])
+
+    @property
+    def nbytes(self):
+        """The memory footprint (in bytes) of the arrays of this index mapping."""
+        nbytes = 0
+        counted = list()
+        for data in (
+                self._members, self._offsets, self._e2c, self._reference_elements,
+                self._reference_origin, self._reference_delta, self._reference_regions
+        ):
+            if data is None or any([data is _ for _ in counted]):  # shared arrays count once.
+                pass
+            else:
+                counted.append(data)
+                nbytes += data.nbytes
+        return nbytes
+
     @property
     def _involved_regions(self):
         """The involved regions."""
         if self.___involved_regions___ is None:
-            self.___involved_regions___ = list(set(self._reference_regions))
+            self.___involved_regions___ = np.unique(self._reference_regions).tolist()
         return self.___involved_regions___
 
     def distribute_according_to_reference_elements_dict(self, data_dict):
@@ -408,26 +775,77 @@ class MsePyMeshElementsIndexMapping(Frozen):
             assert re in data_dict, f"data_dict miss data for reference element {re}."
         return _DataDictDistributor(self, data_dict)
 
+    def distribute_stacked(self, stacked):
+        """We make a distributor from the data of all groups stacked along the first axis, `stacked[g]` is the
+        data of group #g; no copy is made.
+        """
+        assert len(stacked) == len(self), f"stacked data must be of {len(self)} groups."
+        data_dict = dict(zip(self._reference_elements.tolist(), stacked))
+        return _DataDictDistributor(self, data_dict, stacked=stacked)
+
+    def execute_by_groups(self, kernel, *args, **kwargs):
+        """Run `kernel(reference_element, members, *args, **kwargs)` once for each group, where `members` are
+        all elements of the group (a 1-d int array view), and distribute the results to all elements.
+
+        So a kernel computes for the reference element and, if it needs, for all members at once; no loop over
+        elements is done in Python.
+
+        Returns
+        -------
+        distributor : _DataDictDistributor
+            `distributor(elements)` is the result for `elements` (an int or a 1-d int array).
+
+        """
+        data_dict = dict()
+        for g, re in enumerate(self._reference_elements.tolist()):
+            data_dict[re] = kernel(re, self._group_members(g), *args, **kwargs)
+        return _DataDictDistributor(self, data_dict)
+
 
 class _DataDictDistributor(Frozen):
-    """"""
+    """Distribute the data of reference elements to all elements.
+
+    Data of all reference elements (if they are arrays of the same shape) are stacked into one array when the
+    first batch of elements is asked, so `self(elements)` for an int array `elements` is one gather.
+    """
 
-    def __init__(self, index_mapping, data_dict):
+    def __init__(self, index_mapping, data_dict, stacked=None):
         """"""
         self._mp = index_mapping
         self._dd = data_dict
+        self._stacked = stacked
         self._freeze()
 
+    @property
+    def stacked(self):
+        """The data of all groups stacked along a new first axis, `(num_groups, *data_shape)`."""
+        if self._stacked is None:
+            data = [self._dd[re] for re in self._mp._reference_elements.tolist()]
+            shape = np.shape(data[0])
+            for d in data:
+                assert np.shape(d) == shape, f"data of reference elements must be of the same shape to be stacked."
+            self._stacked = np.stack([np.asarray(_) for _ in data])
+        return self._stacked
+
     def get_data_of_element(self, i):
-        """return the data for element #i."""
-        return self._dd[
-            self._mp._reference_elements[
-                self._mp._e2c[i]
+        """return the data for element #i. If `i` is a 1-d int array (or list) of elements, return their data
+        stacked along the first axis, `(len(i), *data_shape)`.
+        """
+        if np.ndim(i) == 0:
+            return self._dd[
+                self._mp._reference_elements[
+                    self._mp._e2c[i]
+                ]
             ]
-        ]
+        else:
+            return self.stacked[self._mp._e2c[np.asarray(i)]]
+
+    def get_data_of_all_elements(self):
+        """return the data of all elements, `(num_elements, *data_shape)`."""
+        return self.stacked[self._mp._e2c]
 
     def __call__(self, i):
-        """return the data for element #i."""
+        """return the data for element #i (or elements `i`)."""
         return self.get_data_of_element(i)
 
     def __getitem__(self, re):
@@ -437,7 +855,7 @@ class _DataDictDistributor(Frozen):
     def __iter__(self):
         """Go through all reference elements."""
         for re in self._dd:
-            return re
+            yield re
 
     def __len__(self):
         """How many reference element/data."""
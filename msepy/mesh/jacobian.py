@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import sys
+if './' not in sys.path:
+    sys.path.append('./')
+
+import numpy as np
+from src.tools.frozen import Frozen
+from msepy.tools.cache import reference_element_store
+
+
+class MsePyMeshJacobian(Frozen):
+    """The Jacobian matrices of all reference elements (thus of all elements) at some reference coordinates.
+
+    The data is one array, `self.matrix`, of shape `(esd, ndim, *points_shape, num_reference_elements)`;
+    `self.matrix[i, j, ..., c]` is d(x_i)/d(xi_j) of the reference element of group #c of the index mapping.
+    Derived quantities are computed (vectorized over all points and reference elements) once when they are
+    first accessed.
+
+    If the Jacobian matrices are constant in each element (for example, all regions are 'Linear'), we only
+    store them as `(esd, ndim, num_reference_elements)` arrays, and all the above full-shape data are
+    read-only broadcast views of them. If, moreover, the groups of the index mapping are of metric signatures,
+    the derived quantities of the groups are taken from (or put into) `reference_element_store` under the
+    exact identities of their Jacobian matrices, see `signatures`, so they are computed once for all meshes.
+    """
+
+    def __init__(self, index_mapping, jm, points_shape=None):
+        """
+
+        Parameters
+        ----------
+        index_mapping :
+            The index mapping of the elements.
+        jm :
+            The Jacobian matrices of the reference elements, `(esd, ndim, *points_shape, num_reference_elements)`,
+            or `(esd, ndim, num_reference_elements)` for constant Jacobian matrices.
+        points_shape :
+            None, or the shape of the points if `jm` is constant.
+
+        """
+        assert jm.ndim >= 3 and jm.shape[-1] == len(index_mapping), f"jm shape wrong."
+        if points_shape is None:
+            assert jm.ndim > 3, f"jm shape wrong, it must be (esd, ndim, *points_shape, num_reference_elements)."
+        else:
+            assert jm.ndim == 3, f"constant jm shape wrong, it must be (esd, ndim, num_reference_elements)."
+            points_shape = tuple(points_shape)
+        self._mp = index_mapping
+        self._jm = jm
+        self._points_shape = points_shape
+        self._det = None
+        self._inv = None
+        self._metric = None
+        self._signatures = None
+        self._freeze()
+
+    @property
+    def esd(self):
+        return self._jm.shape[0]
+
+    @property
+    def ndim(self):
+        return self._jm.shape[1]
+
+    @property
+    def is_constant(self):
+        """True if the Jacobian matrix of each element is constant (independent of the points)."""
+        return self._points_shape is not None
+
+    def _full(self, data):
+        """Broadcast constant data, `(a, b, num_reference_elements)` or `(num_reference_elements,)`, to the full
+        shape `(a, b, *points_shape, num_reference_elements)` or `(*points_shape, num_reference_elements)`.
+        """
+        if self.is_constant:
+            lead = data.shape[:-1]
+            expanded = data.reshape(lead + (1,) * len(self._points_shape) + data.shape[-1:])
+            return np.broadcast_to(expanded, lead + self._points_shape + data.shape[-1:])
+        else:
+            return data
+
+    @property
+    def matrix(self):
+        """The Jacobian matrices, `(esd, ndim, *points_shape, num_reference_elements)`."""
+        return self._full(self._jm)
+
+    @property
+    def nbytes(self):
+        """The bytes the Jacobian matrices and the derived quantities computed so far take."""
+        return sum([_.nbytes for _ in (self._jm, self._det, self._inv, self._metric) if _ is not None])
+
+    @property
+    def signatures(self):
+        """The identities of the constant Jacobian matrices of the groups, `(shape, bytes)`, one for each group,
+        or None if the Jacobian matrices are not constant.
+
+        They are exact (not the rounded metric signatures of the index mapping, which could merge elements of
+        different sizes of two meshes), so results keyed by them in `reference_element_store` are right for any
+        mesh.
+        """
+        if not self.is_constant:
+            return None
+        elif self._signatures is None:
+            jm = np.ascontiguousarray(np.moveaxis(self._jm, -1, 0), dtype=float)
+            self._signatures = tuple([(jm.shape[1:], _.tobytes()) for _ in jm])
+        else:
+            pass
+        return self._signatures
+
+    def _of_groups(self, kind, compute):
+        """The derived quantity `kind`, `compute(jm)`, of all groups (along the last axis)."""
+        if self.is_constant and self._mp._labels is not None:
+            return reference_element_store.gather(
+                self.signatures, kind, lambda groups: compute(self._jm[..., groups])
+            )
+        else:
+            return compute(self._jm)
+
+    def _stack_of_matrices(self, data):
+        """Move the two matrix axes to the end such that numpy.linalg can work on a stack of matrices."""
+        return np.moveaxis(data, (0, 1), (-2, -1))
+
+    @property
+    def determinant(self):
+        """The determinant of the Jacobian matrices, `(*points_shape, num_reference_elements)`."""
+        if self._det is None:
+            assert self.esd == self.ndim, f"determinant only exists for square Jacobian matrices."
+            self._det = self._of_groups(
+                'Jacobian_determinant', lambda jm: np.linalg.det(self._stack_of_matrices(jm))
+            )
+        return self._full(self._det)
+
+    @property
+    def inverse(self):
+        """The inverse Jacobian matrices, `(ndim, esd, *points_shape, num_reference_elements)`;
+        `self.inverse[j, i, ..., c]` is d(xi_j)/d(x_i).
+        """
+        if self._inv is None:
+            assert self.esd == self.ndim, f"inverse only exists for square Jacobian matrices."
+            self._inv = self._of_groups(
+                'inverse_Jacobian_matrix',
+                lambda jm: np.moveaxis(np.linalg.inv(self._stack_of_matrices(jm)), (-2, -1), (0, 1))
+            )
+        return self._full(self._inv)
+
+    @property
+    def metric(self):
+        """The metric tensor, `g_ij = sum_k J_ki J_kj`, `(ndim, ndim, *points_shape, num_reference_elements)`."""
+        if self._metric is None:
+            self._metric = self._of_groups(
+                'metric', lambda jm: np.einsum('ki...,kj...->ij...', jm, jm, optimize=True)
+            )
+        return self._full(self._metric)
+
+    def get_data_of_element(self, i):
+        """return the Jacobian matrix, `(esd, ndim, *points_shape)`, of element #i. If `i` is a 1-d int array
+        (or list) of elements, return their Jacobian matrices stacked along the first axis,
+        `(len(i), esd, ndim, *points_shape)`, like `_DataDictDistributor`.
+        """
+        if np.ndim(i) == 0:
+            return self.matrix[..., self._mp._e2c[i]]
+        else:
+            return np.moveaxis(self.matrix[..., self._mp._e2c[np.asarray(i)]], -1, 0)
+
+    def __call__(self, i):
+        """return the Jacobian matrix of element #i (or elements `i`)."""
+        return self.get_data_of_element(i)
+
+    def __getitem__(self, re):
+        """return the Jacobian matrix of reference element #re."""
+        return self.get_data_of_element(re)
+
+    def __iter__(self):
+        """Go through all reference elements."""
+        for re in self._mp._reference_elements:
+            yield re
+
+    def __len__(self):
+        """How many reference elements."""
+        return len(self._mp)
+
+
+if __name__ == '__main__':
+    # python msepy/mesh/jacobian.py
+    import __init__ as ph
+    from msepy.tools.quadrature import quadrature
+    space_dim = 1
+    ph.config.set_embedding_space_dim(space_dim)
+
+    # the (rounded) metric signatures of both meshes are 'Linear:x0.001', they must not share results.
+    manifold0 = ph.manifold(space_dim)
+    mesh0 = ph.mesh(manifold0)
+    manifold1 = ph.manifold(space_dim)
+    mesh1 = ph.mesh(manifold1)
+
+    msepy, obj = ph.fem.apply('msepy', locals())
+
+    for i, n in enumerate((1000, 1001)):
+        msh = obj[f'mesh{i}']
+        msepy.config(obj[f'manifold{i}'])('crazy', c=0.)
+        msepy.config(msh)([n])
+        jm = msh.ct.Jacobian_matrix(quadrature(2, 'Gauss'))
+        x = msh.ct.mapping(np.array([-1., 1.]))[0][:, 0]
+        assert np.allclose(jm(0), (x[1] - x[0]) / 2) and np.allclose(jm.determinant, 0.5 / n), f"n={n} wrong."
+        assert np.allclose(jm.inverse, 2 * n) and np.allclose(jm.metric, (0.5 / n) ** 2), f"n={n} wrong."
+        print(msh.elements._index_mapping._labels, jm(0)[0, 0, 0], 0.5 / n)
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import sys
+if './' not in sys.path:
+    sys.path.append('./')
+
+import numpy as np
+from src.tools.frozen import Frozen
+
+
+class MsePyMeshPointLocator(Frozen):
+    """Find the elements containing physical points and the reference coordinates of the points in them.
+
+    It works in two steps:
+
+    1. Candidates: the (padded) bounding boxes of all elements, estimated from `ct.mapping` samples, are
+       put into a uniform bin grid (stored CSR-like, cell -> elements). A point is only checked against
+       the elements whose boxes contain it and which are registered to its cell.
+    2. Inversion: for the best candidates of all points at once, the element mappings are inverted with
+       a vectorized Newton method using the Jacobian matrices; then for the next candidates of the points
+       not found yet, and so on.
+
+    The candidates of a point are tried in the order of the relative distances from the point to the
+    centers of their boxes; a point in more than one element (on element faces) gets the first one found.
+    Points not in any element get element `-1` and reference coordinates `nan`.
+    """
+
+    def __init__(self, mesh, samples=5, padding=0.1):
+        """
+
+        Parameters
+        ----------
+        mesh :
+            The mesh.
+        samples :
+            The amount of sample points along each axis of the reference element to estimate the
+            bounding boxes of elements.
+        padding :
+            Boxes are enlarged by `padding` times their sizes (on each side) since a curved element can
+            bulge out between the sample points.
+
+        """
+        assert mesh.esd == mesh.ndim, f"point location only works for mesh.ndim == embedding space dimensions."
+        assert samples % 1 == 0 and samples >= 2, f"samples={samples} wrong, it must be an int >= 2."
+        assert padding >= 0, f"padding={padding} wrong, it must be >= 0."
+        self._mesh = mesh
+        self._samples = int(samples)
+        self._padding = padding
+        self._box_lower = None   # (num_elements, ndim)
+        self._box_upper = None   # (num_elements, ndim)
+        self._grid_lower = None  # (ndim,) the lower corner of the bin grid.
+        self._cell_size = None   # (ndim,)
+        self._grid_shape = None  # (ndim,) amount of cells along each axis.
+        self._cell_offsets = None
+        self._cell_members = None
+        self._freeze()
+
+    def __call__(self, *xyz, tolerance=1e-10, max_iterations=20, chunk_size=2**17):
+        """Locate the points `xyz`.
+
+        Parameters
+        ----------
+        xyz :
+            `esd` arrays of the same shape, `points_shape`, the physical coordinates of the points.
+        tolerance :
+            A point is found when the mapping of its reference coordinates is, in every coordinate, within
+            `tolerance` times the largest side of the (padded) element bounding boxes from it, and its
+            reference coordinates are in [-1, 1] (up to `sqrt(tolerance)`).
+        max_iterations :
+            The maximum Newton iterations.
+        chunk_size :
+            Points are located chunk by chunk, `chunk_size` points a chunk, so the memory is bounded.
+
+        Returns
+        -------
+        elements :
+            An int array of shape `points_shape`.
+        xi_et_sg :
+            A list of `ndim` arrays of shape `points_shape`.
+
+        """
+        assert len(xyz) == self._mesh.esd, f"I need {self._mesh.esd} coordinates."
+        xyz = np.broadcast_arrays(*[np.asarray(_, dtype=float) for _ in xyz])
+        points_shape = xyz[0].shape
+        xyz = np.array([_.ravel() for _ in xyz])
+        num_points = xyz.shape[1]
+
+        self._build()
+        elements = np.full(num_points, -1, dtype=int)
+        xi_et_sg = np.full((self._mesh.ndim, num_points), np.nan)
+        for start in range(0, num_points, chunk_size):
+            end = min(start + chunk_size, num_points)
+            elements[start:end], xi_et_sg[:, start:end] = self._locate(xyz[:, start:end], tolerance, max_iterations)
+
+        return elements.reshape(points_shape), [_.reshape(points_shape) for _ in xi_et_sg]
+
+    def _build(self):
+        """Estimate the element bounding boxes and put them into the bin grid."""
+        if self._cell_offsets is not None:
+            return
+        else:
+            pass
+        mesh = self._mesh
+        ndim = mesh.ndim
+        num_elements = mesh.elements._num
+
+        # bounding boxes from samples; element by element chunks bound the memory.
+        r = np.linspace(-1, 1, self._samples)
+        samples = [_.ravel() for _ in np.meshgrid(*[r for _ in range(ndim)], indexing='ij')]
+        lower = np.empty((num_elements, ndim))
+        upper = np.empty((num_elements, ndim))
+        for elements, x in mesh.ct.mapping_chunks(*samples):
+            for i, x_i in enumerate(x):
+                lower[elements, i] = np.min(x_i, axis=0)
+                upper[elements, i] = np.max(x_i, axis=0)
+        pad = self._padding * (upper - lower)
+        self._box_lower = lower - pad
+        self._box_upper = upper + pad
+
+        # the bin grid: a cell is about half as large as a typical element box (so a cell is overlapped
+        # by a few boxes only), and there are at most (about) `2 ** ndim` cells per element.
+        self._grid_lower = self._box_lower.min(axis=0)
+        extent = self._box_upper.max(axis=0) - self._grid_lower
+        typical = 0.5 * np.median(self._box_upper - self._box_lower, axis=0)
+        grid_shape = np.ceil(extent / np.maximum(typical, extent * 1e-12)).astype(int)
+        max_cells = max(int(np.ceil(2 * num_elements ** (1 / ndim))), 1)
+        grid_shape = np.clip(grid_shape, 1, max_cells)
+        self._grid_shape = grid_shape
+        self._cell_size = np.where(extent > 0, extent / grid_shape, 1.)
+
+        # register elements to all cells their boxes touch.
+        lo = self._cell_indices(self._box_lower)
+        hi = self._cell_indices(self._box_upper)
+        sizes = hi - lo + 1
+        counts = np.prod(sizes, axis=1)
+        element_of = np.repeat(np.arange(num_elements), counts)
+        k = np.arange(len(element_of)) - np.repeat(np.cumsum(counts) - counts, counts)
+        size_strides = np.cumprod(sizes, axis=1) // sizes
+        cells = np.zeros(len(element_of), dtype=int)
+        grid_strides = np.cumprod(grid_shape) // grid_shape
+        for i in range(ndim):
+            index_i = lo[element_of, i] + (k // size_strides[element_of, i]) % sizes[element_of, i]
+            cells += index_i * grid_strides[i]
+
+        order = np.argsort(cells, kind='stable')  # stable: elements in a cell are in increasing order.
+        self._cell_members = element_of[order]
+        self._cell_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(cells, minlength=int(np.prod(grid_shape))))]
+        )
+
+    def _cell_indices(self, xyz):
+        """The (clipped) indices of the cells points `xyz`, of shape `(num_points, ndim)`, are in."""
+        indices = np.floor((xyz - self._grid_lower) / self._cell_size).astype(int)
+        return np.clip(indices, 0, self._grid_shape - 1)
+
+    def _locate(self, xyz, tolerance, max_iterations):
+        """Locate a chunk of points, `xyz` of shape `(esd, num_points)`."""
+        ndim = self._mesh.ndim
+        num_points = xyz.shape[1]
+        points = xyz.T
+
+        # candidates: (point, element) pairs whose element boxes contain the point.
+        cell_indices = self._cell_indices(points)
+        grid_strides = np.cumprod(self._grid_shape) // self._grid_shape
+        cells = cell_indices @ grid_strides
+        starts = self._cell_offsets[cells]
+        counts = self._cell_offsets[cells + 1] - starts
+        pair_point = np.repeat(np.arange(num_points), counts)
+        pair_element = self._cell_members[
+            np.arange(len(pair_point)) - np.repeat(np.cumsum(counts) - counts - starts, counts)
+        ]
+        in_box = np.all(
+            (points[pair_point] >= self._box_lower[pair_element]) &
+            (points[pair_point] <= self._box_upper[pair_element]),
+            axis=1
+        )
+        pair_point = pair_point[in_box]
+        pair_element = pair_element[in_box]
+
+        # rank the candidates of each point by the relative distance from the point to their box centers.
+        lower = self._box_lower[pair_element]
+        size = self._box_upper[pair_element] - lower
+        size = np.where(size > 0, size, 1.)
+        relative = (2 * (points[pair_point] - lower) / size - 1) * (1 + 2 * self._padding)
+        order = np.lexsort((np.max(np.abs(relative), axis=1), pair_point))
+        pair_point = pair_point[order]
+        pair_element = pair_element[order]
+        relative = relative[order]
+        first_pair = np.searchsorted(pair_point, pair_point)
+        rank = np.arange(len(pair_point)) - first_pair
+
+        # try the best candidates of all points first, then the next ones for points not found yet, ...
+        scale = max(float(np.max(self._box_upper - self._box_lower)), 1e-300)
+        elements = np.full(num_points, -1, dtype=int)
+        xi_et_sg = np.full((ndim, num_points), np.nan)
+        for r in range(int(rank.max()) + 1 if len(rank) > 0 else 0):
+            pairs = np.nonzero(rank == r)[0]
+            pairs = pairs[elements[pair_point[pairs]] < 0]
+            if len(pairs) == 0:
+                continue
+            else:
+                pass
+            # start from the relative positions of the points in the (un-padded) element boxes.
+            xi = np.clip(relative[pairs], -1, 1).T
+            found, xi = self._newton(
+                xyz[:, pair_point[pairs]], pair_element[pairs], xi, tolerance * scale, max_iterations
+            )
+            found &= np.all(np.abs(xi) <= 1 + np.sqrt(tolerance), axis=0)
+            elements[pair_point[pairs[found]]] = pair_element[pairs[found]]
+            xi_et_sg[:, pair_point[pairs[found]]] = xi[:, found]
+        return elements, xi_et_sg
+
+    def _newton(self, xyz, elements, xi, tolerance, max_iterations):
+        """Vectorized Newton method: find `xi` such that the mapping of `elements` at `xi` is `xyz`.
+
+        Returns
+        -------
+        converged :
+            A 1-d bool array.
+        xi :
+            The reference coordinates, `(ndim, len(elements))`.
+
+        """
+        converged = np.zeros(len(elements), dtype=bool)
+        active = np.arange(len(elements))
+        for _ in range(max_iterations + 1):
+            x, jm = self._mesh.ct._mapping_and_Jacobian_of_elements(elements[active], *xi[:, active])
+            residual = xyz[:, active] - x
+            done = np.max(np.abs(residual), axis=0) <= tolerance
+            converged[active[done]] = True
+            active = active[~done]
+            if len(active) == 0:
+                break
+            else:
+                pass
+            residual = residual[:, ~done]
+            jm = jm[..., ~done]
+            d_xi = np.linalg.solve(np.moveaxis(jm, -1, 0), residual.T[..., np.newaxis])[..., 0].T
+            # damp long steps; they are not reliable for curved elements.
+            d_xi *= np.minimum(1, 0.5 / np.maximum(np.max(np.abs(d_xi), axis=0), 1e-300))
+            xi[:, active] += d_xi
+            # give up those going far away from the element.
+            active = active[np.all(np.abs(xi[:, active]) <= 2, axis=0)]
+            if len(active) == 0:
+                break
+            else:
+                pass
+        return converged, xi
+
+
+if __name__ == '__main__':
+    # python msepy/mesh/locate.py
+    import __init__ as ph
+
+    for space_dim, layout in ((2, [7, 5]), (3, [4, 3, 5])):
+        ph.config.set_embedding_space_dim(space_dim)
+        manifold = ph.manifold(space_dim)
+        mesh = ph.mesh(manifold)
+        msepy, obj = ph.fem.apply('msepy', locals())
+        msepy.config(obj['manifold'])('crazy', c=0.1)
+        msh = obj['mesh']
+        msepy.config(msh)(layout)
+
+        # round trip: map points inside elements, then locate them.
+        np.random.seed(space_dim)
+        elements = np.random.randint(0, msh.elements._num, 500)
+        xi_et_sg = np.random.uniform(-0.95, 0.95, (space_dim, 500))
+        xyz = msh.ct._mapping_and_Jacobian_of_elements(elements, *xi_et_sg)[0]
+        found, xi = msh.locate(*xyz)
+        assert np.all(found == elements), f"elements wrong."
+        assert np.allclose(xi, xi_et_sg, atol=1e-8), f"reference coordinates wrong."
+
+        # points outside the domain, [0, 1]^ndim, are not found.
+        found, xi = msh.locate(*[np.array([1.5, -0.5]) for _ in range(space_dim)])
+        assert np.all(found == -1) and np.all(np.isnan(xi)), f"outside points found."
+        print(space_dim, 'd locate:', len(elements), 'points found back.')
@@ -14,10 +14,27 @@ from msepy.manifold.main import MsePyManifold
 from msepy.mesh.elements import MsePyMeshElements
 from msepy.mesh.coordinate_transformation import MsePyMeshCoordinateTransformation
 from msepy.mesh.visualize.main import MsePyMeshVisualize
-
-
-def config(mesh, manifold, element_layout):
-    """"""
+from msepy.mesh.locate import MsePyMeshPointLocator
+from msepy.mesh.refine import MsePyMeshRefinement
+from msepy.mesh.boundary import MsePyMeshBoundaryFaces
+from msepy.mesh.topology import MsePyMeshTopology
+
+
+def config(mesh, manifold, element_layout, renumbering=None):
+    """
+
+    Parameters
+    ----------
+    mesh
+    manifold
+    element_layout
+    renumbering :
+        None (the natural numbering, region by region), 'rcm' or 'hilbert'; see `elements._renumber`.
+        'rcm' reduces the bandwidth of the element adjacency (for banded sparse systems); 'hilbert' only
+        improves the spatial locality and usually makes the bandwidth LARGER than that of the natural
+        numbering, so do not use it to reduce the bandwidth.
+
+    """
     assert manifold.__class__ is MsePyManifold and \
         mesh.abstract.manifold is manifold.abstract, \
         "mesh and manifold are not compatible."
@@ -26,6 +43,10 @@ def config(mesh, manifold, element_layout):
     mesh._manifold = manifold
     mesh._elements = MsePyMeshElements(mesh)  # initialize the mesh elements.
     mesh._parse_elements_from_element_layout(element_layout)
+    if renumbering is not None:
+        mesh.elements._renumber(renumbering)  # the bandwidths are reported in `elements._renumbering_report`.
+    else:
+        pass
     mesh._config_dependent_meshes()  # config all mesh on boundary or partition of the manifold.
     assert mesh.elements._index_mapping is not None, \
         f"we should have set elements._index_mapping"
@@ -41,6 +62,10 @@ class MsePyMesh(Frozen):
         self._elements = None
         self._ct = MsePyMeshCoordinateTransformation(self)
         self._visualize = None
+        self._locate = None
+        self._boundary_faces = None
+        self._topology = None
+        self._base = None  # for the mesh on the boundary of another mesh, the other mesh.
         self._freeze()
 
     @property
@@ -108,6 +133,35 @@ class MsePyMesh(Frozen):
         """"""
         # Cannot repeat `_generate_elements_from_layout`, must code a method like
         # `_generate_elements_from_region_map`.
+        # For now, the boundary is represented by the boundary (element, face) pairs of this mesh; the mesh on
+        # the boundary (see `msepy.main._Config`) refers to them through its `base`.
+        self._boundary_faces = MsePyMeshBoundaryFaces(self)
+
+    @property
+    def boundary_faces(self):
+        """The (element, face) pairs on the boundary, split into sections `(region, region_face)`.
+
+        For the mesh on the boundary of a mesh, they are the boundary faces of that mesh. Boundary sections
+        defined by `BoundaryCondition.partition` are not mapped to them; see `MsePyMeshBoundaryFaces`.
+        """
+        if self._base is not None:
+            return self._base.boundary_faces
+        else:
+            if self._boundary_faces is None:
+                self._boundary_faces = MsePyMeshBoundaryFaces(self)
+            return self._boundary_faces
+
+    @property
+    def topology(self):
+        """`mesh.topology(k, degree)` gives the global numbering of the k-dimensional sub-geometries."""
+        if self._topology is None:
+            self._topology = MsePyMeshTopology(self)
+        return self._topology
+
+    @property
+    def base(self):
+        """For the mesh on the boundary of another mesh, return that mesh; otherwise None."""
+        return self._base
 
     def __repr__(self):
         super_repr = super().__repr__().split('object')[1]
@@ -129,6 +183,26 @@ class MsePyMesh(Frozen):
             self._visualize = MsePyMeshVisualize(self)
         return self._visualize
 
+    @property
+    def locate(self):
+        """`elements, xi_et_sg = mesh.locate(*xyz)` finds the elements containing points `xyz` and the
+        reference coordinates of the points in them."""
+        if self._locate is None:
+            self._locate = MsePyMeshPointLocator(self)
+        return self._locate
+
+    def refine(self, factors=2):
+        """Uniformly refine this mesh; each element is split into `factors` elements along each axis.
+
+        Returns
+        -------
+        refinement : MsePyMeshRefinement
+            `refinement.child` is the refined mesh; `refinement.child_to_parent` and
+            `refinement.parent_to_children` relate the elements of the two meshes.
+
+        """
+        return MsePyMeshRefinement(self, factors)
+
 
 if __name__ == '__main__':
     # python msepy/mesh/main.py
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import sys
+if './' not in sys.path:
+    sys.path.append('./')
+
+import numpy as np
+from src.tools.frozen import Frozen
+from msepy.mesh.elements import MsePyMeshElements, _compact_int_dtype
+
+
+class MsePyMeshRefinement(Frozen):
+    """A uniform h-refinement of a configured mesh, `parent`, into a new mesh, `child`, on the same manifold.
+
+    Each parent element is split into `factors[0] x factors[1] x ...` children. The children of parent
+    element #p are `self.parent_to_children[p]`, in the Fortran order of their positions in the parent
+    (like the numbering of elements in a region), and `self.child_to_parent[c]` is the parent of child #c.
+    """
+
+    def __init__(self, parent, factors=2):
+        """
+
+        Parameters
+        ----------
+        parent :
+            A configured mesh.
+        factors :
+            An int (for all axes) or a list of ints (one for each axis).
+
+        """
+        ndim = parent.ndim
+        if isinstance(factors, (int, float)):
+            factors = [factors for _ in range(ndim)]
+        else:
+            assert len(factors) == ndim, f"factors={factors} dimensions wrong."
+        for f in factors:
+            assert f % 1 == 0 and f >= 1, f"factors={factors} illegal, they must be positive integers."
+        factors = [int(_) for _ in factors]
+        if not parent.manifold.regions.is_structured():
+            # regions can be glued with permuted axes, so interfaces only stay conforming with equal factors.
+            assert all([_ == factors[0] for _ in factors]), \
+                f"for unstructured regions, factors must be the same along all axes."
+        else:
+            pass
+
+        child = parent.__class__(parent.abstract)
+        child._manifold = parent.manifold
+        child._elements = MsePyMeshElements(child)
+        child_to_parent, sub_position = child.elements._generate_elements_from_refinement(parent.elements, factors)
+        child._config_dependent_meshes()
+
+        parent_to_children = np.empty(
+            (parent.elements._num, int(np.prod(factors))), dtype=_compact_int_dtype(child.elements._num)
+        )
+        parent_to_children[child_to_parent, sub_position] = np.arange(child.elements._num)
+
+        self._parent = parent
+        self._child = child
+        self._factors = tuple(factors)
+        self._c2p = child_to_parent
+        self._p2c = parent_to_children
+        self._sub_position = sub_position
+        self._freeze()
+
+    @property
+    def parent(self):
+        """The coarse mesh."""
+        return self._parent
+
+    @property
+    def child(self):
+        """The refined mesh."""
+        return self._child
+
+    @property
+    def factors(self):
+        """How many children along each axis a parent element is split into."""
+        return self._factors
+
+    @property
+    def child_to_parent(self):
+        """A 1-d int array, `child_to_parent[c]` is the parent of child element #c."""
+        return self._c2p
+
+    @property
+    def parent_to_children(self):
+        """A 2-d int array of shape `(num_parent_elements, prod(factors))`, the children of each parent."""
+        return self._p2c
+
+    def parent_coordinates(self, children, *xi_et_sg):
+        """Map the reference coordinates `xi_et_sg` of `children` into the reference coordinates of their parents.
+
+        Parameters
+        ----------
+        children :
+            A 1-d int array of child elements.
+        xi_et_sg :
+            Reference coordinates in [-1, 1]; arrays which can be broadcast against `children`.
+
+        """
+        position = self._sub_position[np.asarray(children)]
+        parent_xi = list()
+        stride = 1
+        for f, xi in zip(self._factors, xi_et_sg):
+            s = (position // stride) % f
+            parent_xi.append((np.asarray(xi) + 1 + 2 * s) / f - 1)
+            stride *= f
+        return parent_xi
+
+
+if __name__ == '__main__':
+    # python msepy/mesh/refine.py
+    import __init__ as ph
+    from msepy.tools.quadrature import quadrature
+
+    def volumes(msh):
+        """The volumes of all elements by a Gauss quadrature."""
+        q = quadrature([7 for _ in range(msh.ndim)], 'Gauss')
+        xi = [_.ravel('F') for _ in q.mesh_grid]
+        num_elements, num_nodes = msh.elements._num, len(xi[0])
+        elements = np.repeat(np.arange(num_elements), num_nodes)
+        jm = msh.ct._mapping_and_Jacobian_of_elements(elements, *[np.tile(_, num_elements) for _ in xi])[1]
+        det = np.linalg.det(np.moveaxis(jm, -1, 0)).reshape(num_elements, num_nodes)
+        return det @ q.tensor_weights
+
+    for space_dim, layout, factors in ((2, [4, 3], [2, 3]), (3, [2, 3, 2], 2)):
+        ph.config.set_embedding_space_dim(space_dim)
+        manifold = ph.manifold(space_dim)
+        mesh = ph.mesh(manifold)
+        msepy, obj = ph.fem.apply('msepy', locals())
+        msepy.config(obj['manifold'])('crazy', c=0.1)
+        msh = obj['mesh']
+        msepy.config(msh)(layout)
+        refinement = msh.refine(factors)
+        child = refinement.child
+
+        # children fill their parents: child volumes sum to the parent volume.
+        parent_volumes = volumes(msh)
+        child_volumes = volumes(child)
+        assert np.allclose(np.bincount(refinement.child_to_parent, weights=child_volumes), parent_volumes)
+        assert np.allclose(child_volumes[refinement.parent_to_children].sum(axis=1), parent_volumes)
+        assert np.all(refinement.child_to_parent[refinement.parent_to_children].T == np.arange(msh.elements._num))
+
+        # a point of a child is the same point of its parent.
+        children = np.arange(child.elements._num)
+        xi = [np.full(len(children), 0.3 * (i + 1)) for i in range(space_dim)]
+        x_child = child.ct._mapping_and_Jacobian_of_elements(children, *xi)[0]
+        x_parent = msh.ct._mapping_and_Jacobian_of_elements(
+            refinement.child_to_parent, *refinement.parent_coordinates(children, *xi)
+        )[0]
+        assert np.allclose(x_child, x_parent), f"parent coordinates wrong."
+        print(space_dim, 'd refine:', msh.elements._num, '->', child.elements._num, 'elements;', parent_volumes.sum())
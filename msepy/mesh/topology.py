@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import sys
+if './' not in sys.path:
+    sys.path.append('./')
+
+from itertools import combinations
+from numbers import Real
+import numpy as np
+from src.tools.frozen import Frozen
+from msepy.mesh.elements import _compact_int_dtype
+
+_default_chunk_values = 2 ** 22  # at most (about) how many entity pairs are generated at once.
+
+
+class MsePyMeshTopology(Frozen):
+    """Global numbering of the k-dimensional sub-geometries (nodes, edges, faces, ...) of the elements of a mesh
+    of (tensor-product) degree `p`.
+
+    The sub-geometries of an element of degree `(p0, p1, ...)` are the points of a staggered lattice of shape
+    `(2*p0+1, 2*p1+1, ...)`: lattice coordinate `2i` is node #i along the axis and `2i+1` is the segment
+    between node #i and #i+1. So a k-dimensional sub-geometry has odd coordinates along exactly k axes.
+
+    Local numbering (in an element) of the k-dimensional sub-geometries: they are grouped by types, the axes
+    along which they extend, in the order of `itertools.combinations(range(ndim), k)` (for example, in 2-d,
+    edges along x then edges along y); in a type, they are in the Fortran order of the lattice.
+
+    Sub-geometries shared by neighbouring elements (according to `elements.map`, thus including periodic
+    identifications and regions glued in any orientation) get the same global number. Global numbers are
+    given in the order of the first (element, local number) of each sub-geometry.
+    """
+
+    def __init__(self, mesh):
+        """"""
+        self._mesh = mesh
+        self._cache = dict()
+        self._pairs = None
+        self._freeze()
+
+    def __call__(self, k, degree):
+        """The global numbering of the k-dimensional sub-geometries for elements of `degree`.
+
+        Parameters
+        ----------
+        k :
+            0 (nodes), 1 (edges), 2 (faces), ..., `ndim` (cells; never shared).
+        degree :
+            An int, or a list of ints (one for each axis).
+
+        Returns
+        -------
+        numbering : MsePyMeshTopologyNumbering
+
+        """
+        ndim = self._mesh.ndim
+        assert k % 1 == 0 and 0 <= k <= ndim, f"k={k} is wrong for {ndim}-d mesh."
+        if isinstance(degree, Real):
+            degree = [degree for _ in range(ndim)]
+        else:
+            assert len(degree) == ndim, f"degree={degree} dimensions wrong."
+        for p in degree:
+            assert p % 1 == 0 and p >= 1, f"degree={degree} illegal, must be positive integers."
+        degree = tuple([int(_) for _ in degree])
+        key = (int(k), degree)
+        if key not in self._cache:
+            self._cache[key] = self._number(*key)
+        else:
+            pass
+        return self._cache[key]
+
+    def _number(self, k, degree):
+        """"""
+        elements = self._mesh.elements
+        num_elements = elements._num
+        local_index, types = _local_lattice_index(k, degree)
+        num_local = int(np.max(local_index)) + 1
+        num_vertices = num_elements * num_local
+        dtype = _compact_int_dtype(num_vertices)
+
+        # min-label propagation over the pairs of identical sub-geometries of neighbouring elements.
+        labels = np.arange(num_vertices, dtype=dtype)
+        pairings = list()
+        for signature, (e, n) in self._face_pairs().items():
+            mu, mv = _face_correspondence(local_index, degree, *signature)
+            if len(mu) > 0:
+                pairings.append((e, n, mu, mv))
+            else:
+                pass
+
+        while len(pairings) > 0:
+            old = labels.copy()
+            for e, n, mu, mv in pairings:
+                chunk = max(1, _default_chunk_values // len(mu))
+                for start in range(0, len(e), chunk):
+                    u = (e[start:start + chunk, np.newaxis] * num_local + mu).ravel()
+                    v = (n[start:start + chunk, np.newaxis] * num_local + mv).ravel()
+                    m = np.minimum(labels[u], labels[v])
+                    np.minimum.at(labels, u, m)
+                    np.minimum.at(labels, v, m)
+            while True:  # pointer jumping.
+                jumped = labels[labels]
+                if np.array_equal(jumped, labels):
+                    break
+                else:
+                    labels = jumped
+            if np.array_equal(old, labels):
+                break
+            else:
+                pass
+
+        representative = labels == np.arange(num_vertices, dtype=dtype)
+        numbers = np.cumsum(representative, dtype=dtype) - 1
+        gathering = numbers[labels].reshape(num_elements, num_local)
+        num = int(np.count_nonzero(representative))
+        return MsePyMeshTopologyNumbering(k, degree, types, gathering.astype(np.int32, copy=False), num)
+
+    def _face_pairs(self):
+        """Pairs of glued element faces, grouped by their signatures `(j, j_neighbor, permutation, flips)`.
+
+        Returns
+        -------
+        pairs : dict
+            Keys are signatures; values are `(elements, neighbors)`, two 1-d int arrays; face #j of
+            `elements[m]` is glued to face #j_neighbor of `neighbors[m]`.
+
+        """
+        if self._pairs is not None:
+            return self._pairs
+        else:
+            pass
+        mesh = self._mesh
+        ndim = mesh.ndim
+        element_map = mesh.elements.map
+        E, J = np.nonzero(element_map >= 0)
+        N = element_map[E, J]
+        JN = J ^ 1  # the opposite face of the same axis, which holds inside regions and for structured regions.
+        identity = tuple(range(ndim - 1))
+        no_flip = tuple([False for _ in range(ndim - 1)])
+        permutations = np.zeros(len(E), dtype=int)  # index of (permutation, flips) in `orientations`.
+        orientations = [(identity, no_flip)]
+
+        regions = mesh.manifold.regions
+        if not regions.is_structured():
+            in_regions, local_indices = mesh.elements._find_region_and_local_indices_of_elements(E)
+            distribution = np.array([mesh.elements._distribution[r] for r in regions])
+            axis = J // 2
+            layer = local_indices[np.arange(len(E)), axis]
+            on_region_face = np.where(J % 2 == 0, layer == 0, layer == distribution[in_regions, axis] - 1)
+            region_faces = in_regions * 2 * ndim + J
+            for code in np.unique(region_faces[on_region_face]).tolist():
+                interface = regions.interfaces[divmod(code, 2 * ndim)]
+                assert interface is not None, f"trivial check."
+                _, neighbor_face, permutation, flips = interface
+                selected = on_region_face & (region_faces == code)
+                JN[selected] = neighbor_face
+                if (permutation, flips) not in orientations:
+                    orientations.append((permutation, flips))
+                else:
+                    pass
+                permutations[selected] = orientations.index((permutation, flips))
+        else:
+            pass
+
+        # each pair of glued faces once.
+        once = E * 2 * ndim + J < N * 2 * ndim + JN
+        E, J, N, JN, permutations = E[once], J[once], N[once], JN[once], permutations[once]
+
+        codes = (J * 2 * ndim + JN) * len(orientations) + permutations
+        pairs = dict()
+        for code in np.unique(codes).tolist():
+            selected = codes == code
+            j_jn, o = divmod(code, len(orientations))
+            j, jn = divmod(j_jn, 2 * ndim)
+            pairs[(j, jn) + orientations[o]] = (E[selected], N[selected])
+        self._pairs = pairs
+        return pairs
+
+
+def _local_lattice_index(k, degree):
+    """The local numbers of the k-dimensional sub-geometries on the staggered lattice of an element.
+
+    Returns
+    -------
+    local_index :
+        An int array of the lattice shape, `(2*p0+1, 2*p1+1, ...)`; the local number of the sub-geometry
+        at each lattice point, or -1 if it is not k-dimensional.
+    types : list
+        The types (the axes along which sub-geometries extend) in the local numbering order.
+
+    """
+    ndim = len(degree)
+    shape = tuple([2 * p + 1 for p in degree])
+    local_index = - np.ones(shape, dtype=int)
+    types = list(combinations(range(ndim), k))
+    current = 0
+    for tp in types:
+        indices = list()
+        for a in range(ndim):
+            if a in tp:
+                indices.append(np.arange(1, shape[a], 2))
+            else:
+                indices.append(np.arange(0, shape[a], 2))
+        num = int(np.prod([len(_) for _ in indices]))
+        local_index[np.ix_(*indices)] = current + np.arange(num).reshape([len(_) for _ in indices], order='F')
+        current += num
+    return local_index, types
+
+
+def _face_correspondence(local_index, degree, j, jn, permutation, flips):
+    """The local numbers `mu` (on face #j of an element) and `mv` (on face #jn of its neighbor) of the same
+    sub-geometries; tangential axis #k of face #j is tangential axis #`permutation[k]` of face #jn, reversed
+    if `flips[k]`.
+    """
+    ndim = len(degree)
+    shape = local_index.shape
+    axis, side = j // 2, j % 2
+    axis_n, side_n = jn // 2, jn % 2
+    tangential = [a for a in range(ndim) if a != axis]
+    tangential_n = [a for a in range(ndim) if a != axis_n]
+
+    # lattice coordinates of all points on face #j, and of the same points on face #jn of the neighbor.
+    grids = np.meshgrid(*[np.arange(shape[a]) for a in tangential], indexing='ij')
+    grids = [_.ravel(order='F') for _ in grids]
+    num_points = len(grids[0]) if len(grids) > 0 else 1
+    coordinates = [None for _ in range(ndim)]
+    coordinates_n = [None for _ in range(ndim)]
+    coordinates[axis] = np.full(num_points, 0 if side == 0 else shape[axis] - 1)
+    coordinates_n[axis_n] = np.full(num_points, 0 if side_n == 0 else shape[axis_n] - 1)
+    for t, (a, grid) in enumerate(zip(tangential, grids)):
+        a_n = tangential_n[permutation[t]]
+        assert degree[a] == degree[a_n], f"degrees do not match at an interface."
+        coordinates[a] = grid
+        coordinates_n[a_n] = shape[a_n] - 1 - grid if flips[t] else grid
+
+    mu = local_index[tuple(coordinates)]
+    mv = local_index[tuple(coordinates_n)]
+    sub_geometries = mu >= 0
+    return mu[sub_geometries], mv[sub_geometries]
+
+
+class MsePyMeshTopologyNumbering(Frozen):
+    """The global numbering of the k-dimensional sub-geometries; see `MsePyMeshTopology`."""
+
+    def __init__(self, k, degree, types, gathering, num):
+        """"""
+        self._k = k
+        self._degree = degree
+        self._types = types
+        self._gathering = gathering
+        self._num = num
+        self._freeze()
+
+    @property
+    def k(self):
+        """The dimensions of the sub-geometries."""
+        return self._k
+
+    @property
+    def degree(self):
+        """The degree along each axis."""
+        return self._degree
+
+    @property
+    def types(self):
+        """The types (axes along which sub-geometries extend) in the local numbering order."""
+        return self._types
+
+    @property
+    def gathering(self):
+        """An int32 array of shape `(num_elements, num_local)`; `gathering[e, m]` is the global number of
+        local sub-geometry #m of element #e.
+        """
+        return self._gathering
+
+    @property
+    def num(self):
+        """How many (global) sub-geometries."""
+        return self._num
+
+    def __getitem__(self, e):
+        """The global numbers of the local sub-geometries of element #e."""
+        return self._gathering[e]
+
+    def __len__(self):
+        """How many elements."""
+        return len(self._gathering)
+
+
+if __name__ == '__main__':
+    # python msepy/mesh/topology.py
+    import __init__ as ph
+
+    def expected(k, cells, periodic):
+        """How many k-dimensional sub-geometries a box of `cells` (sub-)cells along each axis has."""
+        num = 0
+        for axes in combinations(range(len(cells)), k):
+            num += int(np.prod([c if i in axes or periodic else c + 1 for i, c in enumerate(cells)]))
+        return num
+
+    # (space dim, manifold, layout, degree, total (sub-)cells along each axis, periodic)
+    cases = (
+        (3, ('crazy', dict(c=0.1)), [2, 3, 2], (1, 2, 3), [2, 6, 6], False),
+        (2, ('crazy', dict(c=0.1, periodic=True)), [3, 4], 2, [6, 8], True),
+        (2, ('twisted_blocks', dict(n=3)), {0: [2, 3], 1: [3, 2], 2: [2, 3]}, 2, [12, 6], False),
+    )
+    for space_dim, (name, kwargs), layout, degree, cells, periodic in cases:
+        ph.config.set_embedding_space_dim(space_dim)
+        manifold = ph.manifold(space_dim)
+        mesh = ph.mesh(manifold)
+        msepy, obj = ph.fem.apply('msepy', locals())
+        msepy.config(obj['manifold'])(name, **kwargs)
+        msh = obj['mesh']
+        msepy.config(msh)(layout)
+
+        nums = list()
+        for k in range(space_dim + 1):
+            numbering = msh.topology(k, degree)
+            assert numbering.num == expected(k, cells, periodic), f"amount of {k}-d sub-geometries wrong."
+            # every global number is used.
+            assert np.all(np.unique(numbering.gathering) == np.arange(numbering.num)), f"numbering not dense."
+            nums.append(numbering.num)
+        # Euler characteristic: 1 for a box, 0 for a torus.
+        euler = sum([(-1) ** k * n for k, n in enumerate(nums)])
+        assert euler == (0 if periodic else 1), f"Euler characteristic wrong."
+        print(name, layout, 'degree', degree, ':', nums)
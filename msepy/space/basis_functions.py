@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import sys
+if './' not in sys.path:
+    sys.path.append('./')
+
+from itertools import combinations
+from numbers import Real
+import numpy as np
+from src.tools.frozen import Frozen
+from msepy.tools.cache import array_fingerprint, shared_cache
+from msepy.tools.polynomials import MsePyPolynomials1D
+from msepy.tools.quadrature import MsePyQuadrature
+
+# evaluations of basis functions are shared by all spaces (in `shared_cache`), keys are
+# `('basis_functions', ndim, k, orientation, degree, nodes, points)`.
+
+_polynomials_1d = dict()  # (p, nodes) -> MsePyPolynomials1D
+
+
+def _polynomials(p, nodes):
+    """The (shared) 1-d polynomials of degree `p` on `nodes`."""
+    key = (p, nodes)
+    if key not in _polynomials_1d:
+        _polynomials_1d[key] = MsePyPolynomials1D(p, nodes=nodes)
+    else:
+        pass
+    return _polynomials_1d[key]
+
+
+class MsePySpaceBasisFunctions(Frozen):
+    """The basis functions of the k-forms of `degree` on the reference element `[-1, 1]^ndim`.
+
+    A component of a k-form is a tensor product of 1-d nodal polynomials (along `ndim - k` axes) and 1-d edge
+    polynomials (along the other `k` axes). Components are, for inner oriented forms (and for all forms except
+    outer oriented 1-forms in 2-d), in the order of `itertools.combinations(range(ndim), k)` of their edge axes,
+    like the types of `MsePyMeshTopology`; outer oriented 1-forms in 2-d are `[(node, edge), (edge, node)]`
+    (the flux through edges along y, then along x). In a component, basis functions and points are both in
+    the Fortran order.
+    """
+
+    def __init__(self, ndim, k, orientation, degree, nodes='Lobatto'):
+        """"""
+        assert k % 1 == 0 and 0 <= k <= ndim, f"k={k} is wrong for {ndim}-d forms."
+        assert orientation in ('inner', 'outer'), f"orientation={orientation} wrong."
+        if isinstance(degree, Real):
+            degree = [degree for _ in range(ndim)]
+        else:
+            assert len(degree) == ndim, f"degree={degree} dimensions wrong."
+        for p in degree:
+            assert p % 1 == 0 and p >= 1, f"degree={degree} illegal, must be positive integers."
+        self._ndim = ndim
+        self._k = int(k)
+        self._orientation = orientation
+        self._degree = tuple([int(_) for _ in degree])
+        self._nodes = nodes
+        self._polynomials = [_polynomials(p, nodes) for p in self._degree]
+
+        edge_axes = list(combinations(range(ndim), self._k))
+        if ndim == 2 and self._k == 1 and orientation == 'outer':
+            edge_axes = edge_axes[::-1]
+        else:
+            pass
+        self._components = [
+            tuple(['edge' if axis in axes else 'node' for axis in range(ndim)]) for axes in edge_axes
+        ]
+        self._freeze()
+
+    @property
+    def ndim(self):
+        return self._ndim
+
+    @property
+    def k(self):
+        return self._k
+
+    @property
+    def degree(self):
+        """The degree along each axis."""
+        return self._degree
+
+    @property
+    def components(self):
+        """The types of the 1-d factors, for example, `('node', 'edge')`, of each component."""
+        return self._components
+
+    @property
+    def num_local_dofs(self):
+        """How many basis functions in each component."""
+        num = list()
+        for component in self._components:
+            num.append(int(np.prod([p + 1 if t == 'node' else p for p, t in zip(self._degree, component)])))
+        return num
+
+    @property
+    def num(self):
+        """How many basis functions."""
+        return sum(self.num_local_dofs)
+
+    def __call__(self, *xi_et_sg):
+        """Evaluate the basis functions at the tensor grid of the 1-d coordinates `xi_et_sg`, or at the nodes
+        of a quadrature, `self(quad)`.
+
+        Returns
+        -------
+        bf : list
+            `bf[c]` is a read-only 2-d array of shape `(num_local_dofs[c], num_points)` of component #c, where
+            `num_points = len(xi_et_sg[0]) * len(xi_et_sg[1]) * ...`.
+
+        """
+        if len(xi_et_sg) == 1 and isinstance(xi_et_sg[0], MsePyQuadrature):
+            points_key = xi_et_sg[0].key  # no need to fingerprint the (shared) nodes.
+            xi_et_sg = xi_et_sg[0].nodes
+        else:
+            points_key = None
+        assert len(xi_et_sg) == self._ndim, f"I need {self._ndim} 1-d arrays of coordinates."
+        xi_et_sg = [np.asarray(_, dtype=float).ravel() for _ in xi_et_sg]
+        if points_key is None:
+            points_key = array_fingerprint(*xi_et_sg)
+        else:
+            pass
+        key = ('basis_functions', self._ndim, self._k, self._orientation, self._degree, self._nodes, points_key)
+        cached = shared_cache.get(key)
+        if cached is not None:
+            return cached
+        else:
+            pass
+
+        factors = dict()  # (axis, type) -> 1-d factor, every 1-d factor is evaluated once.
+        bf = list()
+        for component in self._components:
+            component_factors = list()
+            for axis, t in enumerate(component):
+                if (axis, t) not in factors:
+                    polynomials = self._polynomials[axis]
+                    if t == 'node':
+                        factors[(axis, t)] = polynomials.node_basis(xi_et_sg[axis])
+                    else:
+                        factors[(axis, t)] = polynomials.edge_basis(xi_et_sg[axis])
+                else:
+                    pass
+                component_factors.append(factors[(axis, t)])
+            values = _tensor_product(component_factors)
+            values.flags.writeable = False  # it is cached and shared.
+            bf.append(values)
+
+        shared_cache[key] = bf
+        return bf
+
+
+def _tensor_product(factors):
+    """The tensor product of 1-d factors, each of shape `(num_basis, num_points)` along an axis, with both
+    basis functions and points in the Fortran order (the first axis runs fastest).
+    """
+    values = factors[0]
+    for f in factors[1:]:
+        values = (f[:, np.newaxis, :, np.newaxis] * values[np.newaxis, :, np.newaxis, :]).reshape(
+            f.shape[0] * values.shape[0], f.shape[1] * values.shape[1]
+        )
+    return values
+
+
+if __name__ == '__main__':
+    # python msepy/space/basis_functions.py
+    from msepy.tools.quadrature import quadrature
+    from msepy.tools.polynomials import lobatto_nodes, gauss_nodes
+
+    for nodes, nodes_of in (('Lobatto', lobatto_nodes), ('Gauss', gauss_nodes)):
+        degree = [2, 3]
+        x, y = nodes_of(degree[0]), nodes_of(degree[1])
+
+        # 0-forms: l_i(x_j) = delta_ij, and they sum to 1 anywhere.
+        bf = MsePySpaceBasisFunctions(2, 0, 'inner', degree, nodes=nodes)
+        assert np.allclose(bf(x, y)[0], np.eye(bf.num)), f"node basis is not nodal."
+        r = np.linspace(-1, 1, 7)
+        assert np.allclose(bf(r, r)[0].sum(axis=0), 1), f"node basis is not a partition of unity."
+
+        # 2-forms: the integral of basis function #i over sub-cell #j (both in the Fortran order) is delta_ij.
+        q = quadrature(6, 'Gauss')
+        g, w = q.nodes[0], q.weights[0]
+        xs = np.concatenate([(x[i + 1] - x[i]) / 2 * (g + 1) + x[i] for i in range(degree[0])])
+        ys = np.concatenate([(y[j + 1] - y[j]) / 2 * (g + 1) + y[j] for j in range(degree[1])])
+        bf = MsePySpaceBasisFunctions(2, 2, 'inner', degree, nodes=nodes)
+        values = bf(xs, ys)[0].reshape(bf.num, degree[1], len(g), degree[0], len(g))
+        integrals = np.einsum('bjgih,g,h->bji', values, w, w) * np.outer(np.diff(y), np.diff(x)) / 4
+        assert np.allclose(integrals.reshape(bf.num, -1), np.eye(bf.num)), f"edge basis is not dual to cells."
+
+    # components and their sizes; evaluations are cached and shared.
+    bf = MsePySpaceBasisFunctions(2, 1, 'outer', [2, 3])
+    assert bf.components == [('node', 'edge'), ('edge', 'node')] and bf.num_local_dofs == [9, 8]
+    quad = quadrature([3, 3], 'Gauss')
+    assert bf(quad) is bf(quad) and [_.shape for _ in bf(quad)] == [(9, 16), (8, 16)]
+    bf = MsePySpaceBasisFunctions(3, 2, 'inner', [2, 3, 4])
+    assert bf.components == [('edge', 'edge', 'node'), ('edge', 'node', 'edge'), ('node', 'edge', 'edge')]
+    assert bf.num_local_dofs == [30, 32, 36], f"amount of dofs wrong."
+    print(bf.components, [_.shape for _ in bf(np.linspace(-1, 1, 3), np.linspace(-1, 1, 4), np.linspace(-1, 1, 5))])
@@ -7,16 +7,88 @@ import sys
 if './' not in sys.path:
     sys.path.append('./')
 from src.tools.frozen import Frozen
+from msepy.space.basis_functions import MsePySpaceBasisFunctions
+from msepy.space.mass_matrix import MsePySpaceMassMatrix
 
 
 class MsePySpace(Frozen):
     """"""
 
-    def __init__(self, abstract_space):
+    def __init__(self, abstract_space, mesh=None):
         """"""
         self._abstract = abstract_space
+        self._mesh = mesh  # the msepy mesh of the abstract mesh of the abstract space.
+        self._basis_functions = dict()
+        self._mass_matrices = dict()
         self._freeze()
 
     @property
     def abstract(self):
         return self._abstract
+
+    @property
+    def mesh(self):
+        """The msepy mesh this space is on."""
+        assert self._mesh is not None, f"the msepy mesh of this space is not known."
+        return self._mesh
+
+    @property
+    def ndim(self):
+        return self._abstract.mesh.ndim
+
+    @property
+    def k(self):
+        return self._abstract.k
+
+    @property
+    def orientation(self):
+        return self._abstract.orientation
+
+    def basis_functions(self, degree, nodes='Lobatto'):
+        """The basis functions of `degree` on the reference element; see `MsePySpaceBasisFunctions`.
+
+        Parameters
+        ----------
+        degree :
+            An int, or a list of ints (one for each axis).
+        nodes :
+            'Lobatto' or 'Gauss'.
+
+        """
+        if isinstance(degree, list):
+            degree = tuple(degree)
+        else:
+            pass
+        key = (degree, nodes)
+        if key not in self._basis_functions:
+            self._basis_functions[key] = MsePySpaceBasisFunctions(
+                self.ndim, self.k, self.orientation, degree, nodes=nodes
+            )
+        else:
+            pass
+        return self._basis_functions[key]
+
+    def mass_matrix(self, degree, nodes='Lobatto', quad=None):
+        """The element mass matrices of `degree`; see `MsePySpaceMassMatrix`.
+
+        Parameters
+        ----------
+        degree :
+            An int, or a list of ints (one for each axis).
+        nodes :
+            'Lobatto' or 'Gauss', the nodes of the basis functions.
+        quad :
+            The quadrature (`MsePyQuadrature`); if it is None, we use the Gauss quadrature of `degree + 1`.
+
+        """
+        if isinstance(degree, list):
+            degree = tuple(degree)
+        else:
+            pass
+        key = (degree, nodes, quad)
+        cached = self._mass_matrices.get(key)
+        if cached is None or cached._mp is not self.mesh.elements._index_mapping:  # none, or the mesh changed.
+            self._mass_matrices[key] = MsePySpaceMassMatrix(self, degree, nodes=nodes, quad=quad)
+        else:
+            pass
+        return self._mass_matrices[key]
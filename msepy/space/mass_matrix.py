@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import sys
+if './' not in sys.path:
+    sys.path.append('./')
+
+import numpy as np
+from src.tools.frozen import Frozen
+from src.spaces.main import _default_mass_matrix_reprs
+from msepy.tools.cache import reference_element_store
+from msepy.tools.quadrature import quadrature
+
+
+class MsePySpaceMassMatrix(Frozen):
+    """The element mass matrices, 'MassMatOmega-n{n}-k{k}-d{(d0,d1)}', of the k-forms of `degree`.
+
+    For the components `I`, `J` (the tuples of their edge axes) of the k-forms, the block is
+    `sum_q w_q |det(J_q)| det(G^{-1}_q[I, J]) phi^I(q) phi^J(q)`, where `G^{-1}` is the inverse metric; it is
+    computed for the reference elements of the index mapping only (one `einsum` for all of them) and shared by
+    the members of the groups. If the Jacobian matrices are constant in elements, the metric factors are scalars
+    of the groups that scale the (shared) reference-element products `sum_q w_q phi^I(q) phi^J(q)`, and, if the
+    groups are of metric signatures, the matrices are taken from (or put into) `reference_element_store` under
+    the exact identities of the Jacobian matrices of the groups, `MsePyMeshJacobian.signatures`.
+    """
+
+    def __init__(self, space, degree, nodes='Lobatto', quad=None):
+        """"""
+        bf = space.basis_functions(degree, nodes=nodes)
+        if quad is None:
+            quad = quadrature([p + 1 for p in bf.degree], 'Gauss')
+        else:
+            assert quad.ndim == bf.ndim, f"quad={quad} does not match the {bf.ndim}-d space."
+        mesh = space.mesh
+        eim = mesh.elements._index_mapping
+        lin = _default_mass_matrix_reprs['Omega'][1]
+        lin = lin.replace('{n}', str(space.abstract.n))
+        lin = lin.replace('{k}', str(space.k))
+        lin = lin.replace('{(d0,d1)}', str((degree, degree)))
+        self._lin_repr = lin
+        self._bf = bf
+        self._quad = quad
+        self._mp = eim
+
+        JM = mesh.ct.Jacobian_matrix(quad)
+        if JM.is_constant and eim._labels is not None:
+            M = reference_element_store.gather(
+                JM.signatures, ('MassMatOmega', bf.ndim, bf.k, space.orientation, nodes),
+                lambda groups: np.moveaxis(self._matrices(JM, groups), 0, -1),
+                degree=bf.degree, quadrature=quad,
+            )
+            M = np.ascontiguousarray(np.moveaxis(M, -1, 0))
+        else:
+            M = self._matrices(JM, np.arange(len(eim)))
+        self._distributor = eim.distribute_stacked(M)
+        self._freeze()
+
+    def _matrices(self, JM, groups):
+        """The mass matrices of `groups`, `(len(groups), num_basis, num_basis)`."""
+        bf = self._bf
+        phi = bf(self._quad)
+        weights = self._quad.tensor_weights
+        edge_axes = [tuple([a for a, t in enumerate(c) if t == 'edge']) for c in bf.components]
+        starts = np.cumsum([0, ] + bf.num_local_dofs)
+        constant = JM.is_constant
+
+        # |det J| and the inverse metric, of shape (..., num_points, len(groups)), or (..., len(groups)).
+        det = JM.determinant
+        inverse = JM.inverse
+        if constant:
+            at = (0, ) * (det.ndim - 1)
+            det = det[at]
+            inverse = inverse[(slice(None), slice(None)) + at]
+        else:
+            det = det.reshape(-1, det.shape[-1], order='F')
+            inverse = inverse.reshape(inverse.shape[:2] + (-1, inverse.shape[-1]), order='F')
+        det = np.abs(det[..., groups])
+        inverse_metric = np.einsum('ai...,bi...->ab...', inverse[..., groups], inverse[..., groups], optimize=True)
+
+        M = np.zeros((len(groups), bf.num, bf.num))
+        for c0, I in enumerate(edge_axes):
+            for c1, J in enumerate(edge_axes[c0:], start=c0):
+                if len(I) == 0:
+                    factor = det
+                else:
+                    minor = inverse_metric[np.ix_(I, J)]
+                    factor = det * np.linalg.det(np.moveaxis(minor, (0, 1), (-2, -1)))
+                s0 = slice(starts[c0], starts[c0 + 1])
+                s1 = slice(starts[c1], starts[c1 + 1])
+                if constant:
+                    reference = np.einsum('iq,jq->ij', phi[c0] * weights, phi[c1], optimize=True)
+                    M[:, s0, s1] = factor[:, np.newaxis, np.newaxis] * reference
+                else:
+                    M[:, s0, s1] = np.einsum('iq,jq,qg->gij', phi[c0] * weights, phi[c1], factor, optimize=True)
+                if c1 != c0:
+                    M[:, s1, s0] = np.transpose(M[:, s0, s1], (0, 2, 1))
+                else:
+                    pass
+        return M
+
+    @property
+    def lin_repr(self):
+        """The linguistic representation of the (abstract) root array this mass matrix realizes."""
+        return self._lin_repr
+
+    @property
+    def quad(self):
+        """The quadrature."""
+        return self._quad
+
+    @property
+    def reference(self):
+        """The mass matrices of all groups (reference elements), `(num_groups, num_basis, num_basis)`."""
+        return self._distributor.stacked
+
+    def __call__(self, elements):
+        """The mass matrix of element #`elements`, or, for an int array `elements`, their mass matrices stacked
+        along the first axis.
+        """
+        return self._distributor(elements)
+
+    def __iter__(self):
+        """Go through all reference elements."""
+        for re in self._distributor:
+            yield re
+
+    def __len__(self):
+        """How many reference elements."""
+        return len(self._distributor)
+
+
+if __name__ == '__main__':
+    # python msepy/space/mass_matrix.py
+    import __init__ as ph
+    space_dim = 2
+    ph.config.set_embedding_space_dim(space_dim)
+
+    manifold = ph.manifold(space_dim)
+    mesh = ph.mesh(manifold)
+    ph.space.set_mesh(mesh)
+    spaces = [ph.space.new('Omega', k, orientation='outer') for k in range(space_dim + 1)]
+
+    msepy, obj = ph.fem.apply('msepy', locals())
+    msepy.config(obj['manifold'])('crazy', c=0.2)
+    msepy.config(obj['mesh'])([3, 3])
+    msh = obj['mesh']
+
+    # check element #4 of the curved mesh against a brute-force integration in the physical domain.
+    for space in spaces:
+        space = msepy.base['spaces'][space._sym_repr]
+        mm = space.mass_matrix(2)
+        quad = mm.quad
+        xi, et = [_.ravel('F') for _ in quad.mesh_grid]
+        _, jm = msh.ct._mapping_and_Jacobian_of_elements(np.full(len(xi), 4), xi, et)
+        jm = np.moveaxis(jm, (0, 1), (-2, -1))
+        det = np.abs(np.linalg.det(jm))
+        w = quad.tensor_weights
+        bf = space.basis_functions(2)
+        phi = bf(quad)
+        if space.k == 1:
+            # the coefficient of d(xi_a) is the physical covector of row #a of the inverse Jacobian.
+            axes = [c.index('edge') for c in bf.components]
+            inverse = np.linalg.inv(jm)
+            V = np.concatenate([f[:, :, np.newaxis] * inverse[np.newaxis, :, a, :] for f, a in zip(phi, axes)])
+            M = np.einsum('iqd,jqd,q->ij', V, V, w * det)
+        else:
+            f = np.concatenate(phi)
+            M = (f * w * (det if space.k == 0 else 1 / det)) @ f.T
+        print(mm.lin_repr, mm.reference.shape, np.allclose(M, mm(4)))
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import sys
+if './' not in sys.path:
+    sys.path.append('./')
+
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from src.tools.frozen import Frozen
+
+
+def array_fingerprint(*arrays):
+    """A fingerprint (a hex str) of some arrays computed from their dtypes, shapes and raw bytes.
+
+    Two groups of arrays have the same fingerprint if and only if (up to hash collisions of a 128-bit
+    digest) they are of the same dtypes, shapes and values.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update(str(a.dtype).encode())
+        h.update(str(a.shape).encode())
+        h.update(a.tobytes())
+    return h.hexdigest()
+
+
+def _nbytes_of(value):
+    """Estimate the amount of bytes the arrays in `value` take."""
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    elif isinstance(value, (list, tuple)):
+        return sum([_nbytes_of(_) for _ in value])
+    elif isinstance(value, dict):
+        return sum([_nbytes_of(_) for _ in value.values()])
+    else:
+        return 0
+
+
+class MsePyLRUCache(Frozen):
+    """A least-recently-used cache whose total size (in bytes of arrays) is bounded by `max_bytes`.
+
+    When a new item does not fit, the least recently used items are evicted. An item larger than
+    `max_bytes` is not cached at all. Sizes of items are re-measured when they are hit, so items whose
+    (lazily computed) data grows are accounted correctly.
+    """
+
+    def __init__(self, max_bytes):
+        """"""
+        self._od = OrderedDict()
+        self._sizes = dict()
+        self._nbytes = 0
+        self.max_bytes = max_bytes
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._freeze()
+
+    @property
+    def max_bytes(self):
+        """The byte budget of this cache."""
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes):
+        """"""
+        assert max_bytes >= 0, f"max_bytes={max_bytes} wrong, it must be >= 0."
+        self._max_bytes = max_bytes
+        self._evict()
+
+    @property
+    def nbytes(self):
+        """How many bytes the cached items take."""
+        return self._nbytes
+
+    def stats(self):
+        """The counters of this cache."""
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'evictions': self._evictions,
+            'items': len(self),
+            'nbytes': self._nbytes,
+            'max_bytes': self._max_bytes,
+        }
+
+    def get(self, key, default=None):
+        """Return the item of `key` (and mark it as the most recently used one) or `default`."""
+        if key in self._od:
+            self._hits += 1
+            self._od.move_to_end(key)
+            value = self._od[key]
+            size = _nbytes_of(value)
+            self._nbytes += size - self._sizes[key]
+            self._sizes[key] = size
+            self._evict(keep=key)
+            return value
+        else:
+            self._misses += 1
+            return default
+
+    def __getitem__(self, key):
+        """"""
+        value = self.get(key, default=self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        """"""
+        if key in self._od:
+            self._pop(key)
+        else:
+            pass
+        size = _nbytes_of(value)
+        if size > self._max_bytes:
+            pass   # too big to be cached.
+        else:
+            self._od[key] = value
+            self._sizes[key] = size
+            self._nbytes += size
+            self._evict(keep=key)
+
+    def __contains__(self, key):
+        """Check `key` without counting a hit or miss."""
+        return key in self._od
+
+    def __len__(self):
+        """How many items are cached."""
+        return len(self._od)
+
+    def _pop(self, key):
+        """"""
+        self._nbytes -= self._sizes.pop(key)
+        return self._od.pop(key)
+
+    def _evict(self, keep=None):
+        """Evict the least recently used items until we are within the budget."""
+        while self._nbytes > self._max_bytes and len(self._od) > 0:
+            key = next(iter(self._od))
+            if key == keep:  # `keep` is the most recently used one, so it is the only one left.
+                break
+            else:
+                pass
+            self._pop(key)
+            self._evictions += 1
+
+    def clear(self, prefix=None):
+        """Remove all cached items, or, if `prefix` (a tuple) is given, the items whose (tuple) keys start with
+        it; the counters are not reset.
+        """
+        if prefix is None:
+            self._od.clear()
+            self._sizes.clear()
+            self._nbytes = 0
+        else:
+            for key in self.keys(prefix):
+                self._pop(key)
+
+    def keys(self, prefix=None):
+        """The keys of the cached items (whose keys start with the tuple `prefix`), from the least recently used
+        one; they are not marked as used.
+        """
+        if prefix is None:
+            return list(self._od.keys())
+        else:
+            n = len(prefix)
+            return [key for key in self._od if isinstance(key, tuple) and key[:n] == prefix]
+
+
+# all caches of msepy (element centers and half sizes of layouts, Jacobian matrices of meshes, results of
+# reference elements, evaluations of basis functions, ...) are in this one cache, so they share one byte budget;
+# keys are tuples whose first entries tell what they are. Set the budget with `set_cache_limit`.
+shared_cache = MsePyLRUCache(max_bytes=2 ** 30)
+
+
+def set_cache_limit(max_bytes):
+    """Set the byte budget of `shared_cache`, i.e., of all caches of msepy; least recently used items are evicted
+    at once if they no longer fit.
+    """
+    shared_cache.max_bytes = max_bytes
+
+
+def cache_stats():
+    """The counters of `shared_cache`."""
+    return shared_cache.stats()
+
+
+class MsePyReferenceElementStore(Frozen):
+    """A store of results of reference elements (Jacobian matrices, metric factors, mass matrices, ...) shared
+    by all meshes of the process.
+
+    A result is keyed by `(signature, kind, degree, quadrature)`: `signature` is the exact identity of the
+    geometry of the reference element, see `MsePyMeshJacobian.signatures` (not the rounded metric signatures of
+    `_MsePyRegionMtype._group_elements`, which could merge elements of slightly different sizes); `kind` names
+    the result; `degree` and `quadrature` are hashable identities of what the result also depends on (or None).
+    Elements of the same signature have the same results in any mesh, so they are computed once. The results
+    are kept in `cache` under keys `('reference_element', signature, kind, degree, quadrature)`, so they draw
+    from its byte budget.
+    """
+
+    _prefix = ('reference_element', )
+
+    def __init__(self, cache):
+        """"""
+        self._cache = cache
+        self._freeze()
+
+    @property
+    def nbytes(self):
+        """How many bytes the stored results take."""
+        return sum([self._cache._sizes[key] for key in self._cache.keys(self._prefix)])
+
+    def stats(self):
+        """The counters of the cache the results are in."""
+        return self._cache.stats()
+
+    def clear(self):
+        """Remove all stored results."""
+        self._cache.clear(prefix=self._prefix)
+
+    def __len__(self):
+        """How many results are stored."""
+        return len(self._cache.keys(self._prefix))
+
+    def gather(self, signatures, kind, compute, degree=None, quadrature=None):
+        """The results of reference elements of `signatures`, stacked along the last axis.
+
+        Parameters
+        ----------
+        signatures :
+            The (hashable, exact) signatures of the reference elements (groups).
+        kind :
+            The name of the result, for example, 'Jacobian_matrix'.
+        compute :
+            A function; `compute(groups)`, for a 1-d int array `groups` (indices of `signatures`), returns the
+            results of these groups stacked along the last axis. It is only called for results not stored.
+        degree :
+            A hashable, or None.
+        quadrature :
+            A hashable, or None.
+
+        """
+        keys = [self._prefix + (signature, kind, degree, quadrature) for signature in signatures]
+        found = [self._cache.get(key) for key in keys]
+        missing = [g for g, result in enumerate(found) if result is None]
+        if len(missing) > 0:
+            computed = compute(np.array(missing))
+            for m, g in enumerate(missing):
+                found[g] = computed[..., m].copy()  # not a view, so it does not pin `computed`.
+                self._cache[keys[g]] = found[g]
+        else:
+            pass
+        return np.stack(found, axis=-1)
+
+
+# results of reference elements; shared by all meshes, in `shared_cache`.
+reference_element_store = MsePyReferenceElementStore(shared_cache)
+
+
+if __name__ == '__main__':
+    # python msepy/tools/cache.py
+    cache = MsePyLRUCache(max_bytes=8 * 30)
+    for _ in range(5):
+        cache[array_fingerprint(np.array([_]))] = np.zeros(10)
+    print(cache.stats())
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+One-dimensional mimetic polynomials on [-1, 1]: the nodal (Lagrange) polynomials of some nodes and the edge
+polynomials between them.
+
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import sys
+if './' not in sys.path:
+    sys.path.append('./')
+
+import numpy as np
+from src.tools.frozen import Frozen
+from msepy.tools.quadrature import quadrature
+
+
+def lobatto_nodes(p):
+    """The `p+1` Gauss-Lobatto-Legendre nodes in increasing order (read-only, shared)."""
+    assert p % 1 == 0 and p >= 1, f"p={p} wrong, must be a positive integer."
+    return quadrature(p, 'Lobatto').nodes[0]
+
+
+def gauss_nodes(p):
+    """The `p+1` Gauss-Legendre nodes in increasing order (read-only, shared)."""
+    assert p % 1 == 0 and p >= 0, f"p={p} wrong, must be a non-negative integer."
+    return quadrature(p, 'Gauss').nodes[0]
+
+
+_nodes = {
+    'Lobatto': lobatto_nodes,
+    'Gauss': gauss_nodes,
+}
+
+
+class MsePyPolynomials1D(Frozen):
+    """The nodal polynomials `l_i` (`l_i(x_j) = delta_ij`) of nodes `x_0 < x_1 < ... < x_p`, and the edge
+    polynomials `e_i = - sum_{m <= i} l_m'`, `i = 0, ..., p-1`, whose integrals over `[x_j, x_{j+1}]`
+    are `delta_ij`.
+
+    Parameters
+    ----------
+    p :
+        The degree.
+    nodes :
+        'Lobatto' (the `p+1` GLL nodes) or 'Gauss' (the `p+1` Gauss nodes). For any nodes, `l_j'` is a
+        combination of the edge polynomials, `l_j' = e_{j-1} - e_j` (`e_{-1} = e_p = 0`), so the pair is mimetic.
+
+    """
+
+    def __init__(self, p, nodes='Lobatto'):
+        """"""
+        assert nodes in _nodes, f"nodes={nodes} wrong, must be one of {tuple(_nodes.keys())}."
+        assert p % 1 == 0 and p >= 1, f"p={p} wrong, must be a positive integer."
+        self._p = int(p)
+        self._nodes_type = nodes
+        self._nodes = _nodes[nodes](self._p)
+        self._freeze()
+
+    @property
+    def p(self):
+        return self._p
+
+    @property
+    def nodes_type(self):
+        """'Lobatto' or 'Gauss'."""
+        return self._nodes_type
+
+    @property
+    def nodes(self):
+        """The nodes, `x_0, ..., x_p`; edge polynomial #i is dual to segment `[x_i, x_{i+1}]`."""
+        return self._nodes
+
+    def node_basis(self, x):
+        """The nodal polynomials at `x` (a 1-d array), `(p+1, len(x))`."""
+        return _lagrange(self._nodes, np.asarray(x, dtype=float))[0]
+
+    def node_basis_derivative(self, x):
+        """The derivatives of the nodal polynomials at `x`, `(p+1, len(x))`."""
+        return _lagrange(self._nodes, np.asarray(x, dtype=float))[1]
+
+    def edge_basis(self, x):
+        """The edge polynomials at `x` (a 1-d array), `(p, len(x))`."""
+        d = _lagrange(self._nodes, np.asarray(x, dtype=float))[1]
+        return - np.cumsum(d[:-1], axis=0)
+
+
+def _lagrange(nodes, x):
+    """The Lagrange polynomials of `nodes` and their derivatives at `x`, two arrays of shape
+    `(len(nodes), len(x))`. Products leaving one factor out are computed with prefix and suffix products, so
+    nothing is divided by `x - x_k` and points on nodes are fine.
+    """
+    n = len(nodes)
+    denominators = nodes[:, np.newaxis] - nodes[np.newaxis, :]  # x_i - x_k
+    np.fill_diagonal(denominators, 1.)
+    # T[i, k, :] = (x - x_k) / (x_i - x_k) for k != i, and 1 for k == i.
+    T = (x[np.newaxis, np.newaxis, :] - nodes[np.newaxis, :, np.newaxis]) / denominators[..., np.newaxis]
+    T[np.arange(n), np.arange(n)] = 1.
+    basis = np.prod(T, axis=1)
+
+    # products over k != m of T[i, k], from prefix and suffix products.
+    ones = np.ones((n, 1, len(x)))
+    prefix = np.cumprod(np.concatenate([ones, T[:, :-1]], axis=1), axis=1)
+    suffix = np.cumprod(np.concatenate([ones, T[:, :0:-1]], axis=1), axis=1)[:, ::-1]
+    leave_one_out = prefix * suffix
+    inverse = 1. / denominators
+    np.fill_diagonal(inverse, 0.)
+    derivative = np.einsum('ik,ikx->ix', inverse, leave_one_out)
+    return basis, derivative
+
+
+if __name__ == '__main__':
+    # python msepy/tools/polynomials.py
+    bf = MsePyPolynomials1D(3)
+    print(bf.nodes, bf.edge_basis(np.linspace(-1, 1, 5)))
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Gauss, Gauss-Lobatto and Gauss-Radau quadrature on [-1, 1] and their tensor products. Rules are computed once
+per (category, degree) and shared (as read-only arrays) by all spaces, meshes and caches.
+
+@author: Yi Zhang
+@contact: zhangyi_aero@hotmail.com
+"""
+import sys
+if './' not in sys.path:
+    sys.path.append('./')
+
+from numbers import Real
+import numpy as np
+from numpy.polynomial import legendre
+from scipy.linalg import eigh_tridiagonal
+from src.tools.frozen import Frozen
+
+_rules = dict()   # (category, p) -> (nodes, weights), 1-d rules.
+_quadratures = dict()   # (category, degree) -> MsePyQuadrature
+
+
+def quadrature(degree, category='Gauss'):
+    """The (shared) quadrature of `degree` (`degree + 1` nodes along each axis).
+
+    Parameters
+    ----------
+    degree :
+        An int (1-d), or a list of ints (one for each axis).
+    category :
+        'Gauss', 'Lobatto' (Gauss-Lobatto) or 'Radau' (Gauss-Radau, including -1).
+
+    Returns
+    -------
+    quad : MsePyQuadrature
+
+    """
+    assert category in _categories, f"category={category} wrong, must be one of {tuple(_categories.keys())}."
+    if isinstance(degree, Real):
+        degree = [degree, ]
+    else:
+        pass
+    for p in degree:
+        assert p % 1 == 0 and p >= _categories[category][1], \
+            f"degree={degree} illegal for {category} quadrature, must be integers >= {_categories[category][1]}."
+    degree = tuple([int(_) for _ in degree])
+    key = (category, degree)
+    if key not in _quadratures:
+        _quadratures[key] = MsePyQuadrature(category, degree)
+    else:
+        pass
+    return _quadratures[key]
+
+
+def _rule(category, p):
+    """The read-only nodes and weights of the 1-d rule of `p + 1` nodes."""
+    key = (category, p)
+    if key not in _rules:
+        nodes, weights = _categories[category][0](p + 1)
+        nodes.flags.writeable = False
+        weights.flags.writeable = False
+        _rules[key] = nodes, weights
+    else:
+        pass
+    return _rules[key]
+
+
+def _golub_welsch(diagonal, off_diagonal):
+    """The eigenvalues (nodes) and the squared first components of the eigenvectors of a symmetric tridiagonal
+    Jacobi matrix.
+    """
+    if len(diagonal) == 1:
+        return np.array(diagonal, dtype=float), np.ones(1)
+    else:
+        nodes, vectors = eigh_tridiagonal(diagonal, off_diagonal)
+        return nodes, vectors[0] ** 2
+
+
+def _newton(f, x, steps=2):
+    """Polish roots `x` of the polynomial `f`."""
+    df = f.deriv()
+    for _ in range(steps):
+        x = x - f(x) / df(x)
+    return x
+
+
+def _gauss(n):
+    """The n-point Gauss-Legendre rule."""
+    k = np.arange(1, n)
+    nodes, v2 = _golub_welsch(np.zeros(n), k / np.sqrt(4 * k ** 2 - 1))
+    nodes = _newton(legendre.Legendre.basis(n), nodes)
+    weights = 2 / ((1 - nodes ** 2) * legendre.Legendre.basis(n).deriv()(nodes) ** 2)
+    return nodes, weights
+
+
+def _lobatto(n):
+    """The n-point Gauss-Lobatto-Legendre rule (n >= 2); interior nodes are the roots of P'_{n-1}, the
+    Gauss-Jacobi(1, 1) nodes.
+    """
+    if n == 2:
+        interior = np.zeros(0)
+    else:
+        k = np.arange(1, n - 2)
+        interior, _ = _golub_welsch(np.zeros(n - 2), np.sqrt(k * (k + 2) / ((2 * k + 1) * (2 * k + 3))))
+        interior = _newton(legendre.Legendre.basis(n - 1).deriv(), interior)
+    nodes = np.concatenate([[-1.], interior, [1.]])
+    weights = 2 / (n * (n - 1) * legendre.Legendre.basis(n - 1)(nodes) ** 2)
+    return nodes, weights
+
+
+def _radau(n):
+    """The n-point (left) Gauss-Radau rule, -1 is a node; the other nodes are the roots of
+    (P_{n-1} + P_n) / (1 + x), the Gauss-Jacobi(0, 1) nodes.
+    """
+    if n == 1:
+        return np.array([-1.]), np.array([2.])
+    else:
+        k = np.arange(n - 1)
+        diagonal = 1 / ((2 * k + 1) * (2 * k + 3))
+        k = np.arange(1, n - 1)
+        interior, _ = _golub_welsch(diagonal, np.sqrt(k * (k + 1)) / (2 * k + 1))
+        interior = _newton(legendre.Legendre.basis(n - 1) + legendre.Legendre.basis(n), interior)
+        nodes = np.concatenate([[-1.], interior])
+        weights = (1 - nodes) / (n ** 2 * legendre.Legendre.basis(n - 1)(nodes) ** 2)
+        return nodes, weights
+
+
+_categories = {
+    # category: (the 1-d rule of n nodes, the lowest degree)
+    'Gauss': (_gauss, 0),
+    'Lobatto': (_lobatto, 1),
+    'Radau': (_radau, 0),
+}
+
+
+class MsePyQuadrature(Frozen):
+    """A tensor-product quadrature on `[-1, 1]^ndim`; make it with `quadrature(degree, category)`, then the
+    same object is shared everywhere.
+
+    It is hashable by its identity, `(category, degree)`, so it can be a cache key (of, for example,
+    `MsePyMeshCoordinateTransformation.Jacobian_matrix` or `reference_element_store`).
+    """
+
+    def __init__(self, category, degree):
+        """"""
+        self._category = category
+        self._degree = degree
+        rules = [_rule(category, p) for p in degree]
+        self._nodes = [_[0] for _ in rules]
+        self._weights = [_[1] for _ in rules]
+        self._tensor_weights = None
+        self._mesh_grid = None
+        self._freeze()
+
+    def __repr__(self):
+        """"""
+        return f"<MsePyQuadrature {self._category} {self._degree}>"
+
+    @property
+    def key(self):
+        """The identity, `(category, degree)`."""
+        return self._category, self._degree
+
+    def __hash__(self):
+        """"""
+        return hash(self.key)
+
+    def __eq__(self, other):
+        """"""
+        return other.__class__ is self.__class__ and other.key == self.key
+
+    @property
+    def category(self):
+        return self._category
+
+    @property
+    def degree(self):
+        """The degree along each axis."""
+        return self._degree
+
+    @property
+    def ndim(self):
+        return len(self._degree)
+
+    @property
+    def nodes(self):
+        """The 1-d nodes along each axis (read-only)."""
+        return self._nodes
+
+    @property
+    def weights(self):
+        """The 1-d weights along each axis (read-only)."""
+        return self._weights
+
+    @property
+    def quad(self):
+        """`(nodes, weights)`."""
+        return self._nodes, self._weights
+
+    @property
+    def mesh_grid(self):
+        """The coordinates of all nodes, arrays of shape `(len(nodes[0]), len(nodes[1]), ...)` (read-only)."""
+        if self._mesh_grid is None:
+            mesh_grid = np.meshgrid(*self._nodes, indexing='ij')
+            for _ in mesh_grid:
+                _.flags.writeable = False
+            self._mesh_grid = mesh_grid
+        return self._mesh_grid
+
+    @property
+    def tensor_weights(self):
+        """The weights of all nodes, a 1-d array in the Fortran order (the first axis runs fastest),
+        like basis functions (read-only).
+        """
+        if self._tensor_weights is None:
+            weights = self._weights[0]
+            for w in self._weights[1:]:
+                weights = np.outer(w, weights).ravel()
+            weights.flags.writeable = False
+            self._tensor_weights = weights
+        return self._tensor_weights
+
+
+if __name__ == '__main__':
+    # python msepy/tools/quadrature.py
+    q = quadrature([3, 2], 'Lobatto')
+    print(q, q.nodes, q.tensor_weights.sum())